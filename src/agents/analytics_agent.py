@@ -1,21 +1,29 @@
 """
 LangGraph 5-node analytics agent.
-Intent Classification -> Schema Retrieval -> SQL Gen+Exec -> KPI Calc -> Report Assembly
+Schema Retrieval -> (Intent Classification || SQL Gen+Exec) -> KPI Calc -> Report Assembly
 """
-from typing import TypedDict, List, Optional
-from langgraph.graph import StateGraph, END
-import pandas as pd
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache, lru_cache
+from typing import TYPE_CHECKING, Iterator, TypedDict, List, Optional
 
 from src.llm.provider import LLMProvider
 from src.schema.extractor import extract_schema, get_schema_context
-from src.retrieval.schema_store import SchemaStore
 from src.sql.generator import SQL_SYSTEM_PROMPT, build_sql_prompt, parse_sql_response
 from src.sql.validator import validate_sql
-from src.sql.executor import SQLExecutor
-from src.calculations.kpi_agent import calculate_kpis
-from src.report.summarizer import SUMMARY_SYSTEM_PROMPT, build_summary_prompt
+from src.report.summarizer import SUMMARY_SYSTEM_PROMPT, build_data_preview, build_summary_prompt, build_template_summary
 from src.report.assembler import assemble_report
 
+# Heavy dependencies (langgraph, pandas, scikit-learn) are imported
+# on first use so importing this module stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
+    from langgraph.graph import StateGraph
+    from src.retrieval.schema_store import SchemaStore
+    from src.sql.executor import SQLExecutor
+
 
 # ---- Agent State ----
 class AgentState(TypedDict):
@@ -25,45 +33,122 @@ class AgentState(TypedDict):
     relevant_tables: List[str]
     schema_context: str
     sql_query: str
-    sql_result: Optional[pd.DataFrame]
+    sql_result: Optional[object]  # pandas DataFrame
     calculations: dict
     sql_retries: int
     chart_code: str
     chart_retries: int
     chart_output: Optional[object]
     report_summary: str
+    stream_summary: bool
     final_report: dict
     error: str
 
 
 # ---- Intent Classification Prompt ----
-INTENT_SYSTEM_PROMPT = """Classify the user's manufacturing question into exactly one intent.
-
-Respond with ONLY a JSON object, no explanation:
-{"intent": "LOOKUP|AGGREGATION|COMPARISON|TREND|REPORT", "needs_chart": true|false}
-
-INTENT DEFINITIONS:
+_INTENT_DEFINITIONS = """INTENT DEFINITIONS:
 - LOOKUP: fetch a specific record (e.g., "show me order PO-1042")
 - AGGREGATION: summarize data with averages/totals (e.g., "what was average yield")
 - COMPARISON: compare two groups or periods (e.g., "day shift vs night shift")
 - TREND: show change over time (e.g., "yield trend for last 10 days")
-- REPORT: full summary of a period/shift (e.g., "what happened last shift")
+- REPORT: full summary of a period/shift (e.g., "what happened last shift")"""
+
+INTENT_SYSTEM_PROMPT = f"""Classify the user's manufacturing question into exactly one intent.
+
+Respond with ONLY a JSON object, no explanation:
+{{"intent": "LOOKUP|AGGREGATION|COMPARISON|TREND|REPORT", "needs_chart": true|false}}
+
+{_INTENT_DEFINITIONS}
 
 Return ONLY the JSON object."""
 
+BATCH_INTENT_SYSTEM_PROMPT = f"""Classify each numbered manufacturing question into exactly one intent.
+
+Respond with ONLY a JSON object, no explanation, with one result per question in the same order:
+{{"results": [{{"intent": "LOOKUP|AGGREGATION|COMPARISON|TREND|REPORT", "needs_chart": true|false}}, ...]}}
+
+{_INTENT_DEFINITIONS}
+
+Return ONLY the JSON object."""
+
+# JSON schema for constrained decoding of the intent response
+INTENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {
+            "type": "string",
+            "enum": ["LOOKUP", "AGGREGATION", "COMPARISON", "TREND", "REPORT"],
+        },
+        "needs_chart": {"type": "boolean"},
+    },
+    "required": ["intent", "needs_chart"],
+}
+
+BATCH_INTENT_SCHEMA = {
+    "type": "object",
+    "properties": {"results": {"type": "array", "items": INTENT_SCHEMA}},
+    "required": ["results"],
+}
+
+# Keyword cues for questions that don't need the LLM to classify.
+# A question is only fast-pathed when exactly one intent matches — anything ambiguous goes to the LLM.
+_FAST_INTENT_PATTERNS = (
+    ("LOOKUP", re.compile(r"\b(details? (for|of|on)|what recipe|who (is|are)|PO-\d+)\b", re.I)),
+    ("AGGREGATION", re.compile(r"\b(how many|average|avg|total|percentage|percent)\b", re.I)),
+    ("COMPARISON", re.compile(r"\b(compare|comparison|vs|versus|between|highest|lowest)\b", re.I)),
+    ("TREND", re.compile(r"\b(plot|trends?|over time|daily|weekly|per day)\b", re.I)),
+    ("REPORT", re.compile(r"\b(report|what happened|recap|overview)\b", re.I)),
+)
+# The fast path can't tell whether a question wants a chart (the LLM can — e.g. "average yield
+# per line" is an AGGREGATION worth plotting), so it never switches the LLM chart fallback off.
+# LOOKUP is the exception: _build_chart skips LOOKUP results regardless of needs_chart.
+_NO_CHART_INTENTS = frozenset({"LOOKUP"})
+
+
+# ---- Shared heavy components ----
+# Multiple AnalyticsAgent instances (e.g. a re-created agent) reuse these.
+@cache
+def _shared_llm() -> LLMProvider:
+    return LLMProvider()
+
+
+@cache
+def _shared_pool() -> ThreadPoolExecutor:
+    """Report workers (summary alongside chart) — one pool per process, not one per agent."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="report")
+
+
+@cache
+def _shared_executor(db_path: str) -> "SQLExecutor":
+    from src.sql.executor import SQLExecutor
+    return SQLExecutor(db_path)
+
+
+@cache
+def _shared_schema(db_path: str, mtime: float) -> tuple:
+    """Extracted schema + ingested SchemaStore, rebuilt when the DB file changes."""
+    from src.retrieval.schema_store import SchemaStore
+    schema = extract_schema(db_path)
+    store = SchemaStore()
+    store.ingest(schema)
+    return schema, store
+
 
 class AnalyticsAgent:
     def __init__(self, db_path: str):
         self.db_path = db_path
-        self.llm = LLMProvider()
-        self.executor = SQLExecutor(db_path)
-        self.schema = extract_schema(db_path)
-        self.store = SchemaStore()
-        self.store.ingest(self.schema)
+        abs_path = self._abs_db_path = os.path.abspath(db_path)
+        self.llm = _shared_llm()
+        self.executor = _shared_executor(abs_path)
+        self.schema, self.store = _shared_schema(abs_path, os.path.getmtime(abs_path))
+        self._pool = _shared_pool()
+        # Repeated questions skip the TF-IDF search
+        self._match_tables = lru_cache(maxsize=1024)(self._match_tables_uncached)
         self.graph = self._build_graph()
 
-    def _build_graph(self) -> StateGraph:
+    def _build_graph(self) -> "StateGraph":
         """Build the 5-node LangGraph workflow."""
+        from langgraph.graph import StateGraph, END
         graph = StateGraph(AgentState)
 
         # Add nodes
@@ -74,11 +159,14 @@ class AnalyticsAgent:
         graph.add_node("assemble_report", self.assemble_report_node)
 
         # Set entry point
-        graph.set_entry_point("classify_intent")
+        graph.set_entry_point("retrieve_schema")
 
-        # Linear flow with conditional on SQL
-        graph.add_edge("classify_intent", "retrieve_schema")
+        # The SQL prompt doesn't use the intent, so classification and SQL generation
+        # run in the same step, in parallel. Both finish before KPI calculation
+        # (the first step that reads the intent); retries only loop generate_sql.
+        graph.add_edge("retrieve_schema", "classify_intent")
         graph.add_edge("retrieve_schema", "generate_sql")
+        graph.add_edge("classify_intent", END)
         graph.add_conditional_edges(
             "generate_sql",
             self._sql_router,
@@ -91,36 +179,78 @@ class AnalyticsAgent:
 
     # ---- Node 1: Intent Classifier ----
     def classify_intent(self, state: AgentState) -> dict:
+        # Already classified up front (e.g. by classify_batch) — skip the LLM call
+        if state["intent"]:
+            classification = {"intent": state["intent"], "needs_chart": state["needs_chart"]}
+        else:
+            classification = self._fast_intent(state["query"]) or self._classify_one(state["query"])
+        # Retry counters start at 0 in the initial state — generate_sql writes
+        # sql_retries in this same step, so this node must not
+        return classification
+
+    @staticmethod
+    def _fast_intent(question: str) -> Optional[dict]:
+        """Rule-based classification for unambiguous phrasings — None means ask the LLM."""
+        matches = [intent for intent, pattern in _FAST_INTENT_PATTERNS if pattern.search(question)]
+        if len(matches) != 1:
+            return None
+        return {"intent": matches[0], "needs_chart": matches[0] not in _NO_CHART_INTENTS}
+
+    def _classify_one(self, question: str) -> dict:
         try:
-            response = self.llm.generate(state["query"], INTENT_SYSTEM_PROMPT)
-            # Parse JSON from response
-            import json
-            # Find JSON in response
-            text = response.strip()
-            if "{" in text:
-                json_str = text[text.index("{"):text.rindex("}") + 1]
-                result = json.loads(json_str)
-                intent = result.get("intent", "AGGREGATION").upper()
-                needs_chart = result.get("needs_chart", False)
-            else:
-                intent = "AGGREGATION"
-                needs_chart = False
+            response = self.llm.generate(
+                question, INTENT_SYSTEM_PROMPT, stop_on="}", format=INTENT_SCHEMA
+            )
+            # Decoding is constrained to INTENT_SCHEMA, so the response is the JSON object
+            return self._normalize_intent(json.loads(response))
         except Exception:
-            intent = "AGGREGATION"
-            needs_chart = False
+            return {"intent": "AGGREGATION", "needs_chart": False}
 
+    @staticmethod
+    def _normalize_intent(result: dict) -> dict:
+        intent = str(result.get("intent", "AGGREGATION")).upper()
         valid_intents = {"LOOKUP", "AGGREGATION", "COMPARISON", "TREND", "REPORT"}
         if intent not in valid_intents:
             intent = "AGGREGATION"
+        return {"intent": intent, "needs_chart": bool(result.get("needs_chart", False))}
+
+    def classify_batch(self, questions: list) -> list:
+        """
+        Classify many questions with a single LLM call.
+        Returns one {"intent", "needs_chart"} dict per question, in order — pass each to
+        ask(..., classification=...). Falls back to one call per question if the batch answer doesn't line up.
+        Questions the keyword rules resolve are left out of the LLM call.
+        """
+        classifications = [self._fast_intent(q) for q in questions]
+        pending = [i for i, c in enumerate(classifications) if c is None]
+        if pending:
+            for i, c in zip(pending, self._classify_llm_batch([questions[i] for i in pending])):
+                classifications[i] = c
+        return classifications
+
+    def _classify_llm_batch(self, questions: list) -> list:
+        prompt = "\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+        try:
+            response = self.llm.generate(prompt, BATCH_INTENT_SYSTEM_PROMPT, format=BATCH_INTENT_SCHEMA)
+            results = json.loads(response)["results"]
+        except Exception:
+            results = None
 
-        return {"intent": intent, "needs_chart": needs_chart, "sql_retries": 0, "chart_retries": 0}
+        if not isinstance(results, list) or len(results) != len(questions):
+            return [self._classify_one(q) for q in questions]
+        return [self._normalize_intent(r) if isinstance(r, dict) else self._classify_one(q)
+                for q, r in zip(questions, results)]
 
     # ---- Node 2: Schema Retriever ----
     def retrieve_schema(self, state: AgentState) -> dict:
-        tables = self.store.get_matched_table_names(state["query"], top_k=4)
-        schema_context = get_schema_context(self.schema, tables)
+        # TF-IDF lowercases anyway, so case/whitespace variants share a cache entry
+        tables = list(self._match_tables(state["query"].lower().strip(), 4))
+        schema_context = get_schema_context(self.schema, tables, self._abs_db_path)
         return {"relevant_tables": tables, "schema_context": schema_context}
 
+    def _match_tables_uncached(self, query: str, top_k: int) -> tuple:
+        return tuple(self.store.get_matched_table_names(query, top_k=top_k))
+
     # ---- Node 3: SQL Generator + Executor ----
     def generate_sql(self, state: AgentState) -> dict:
         error_ctx = state.get("error") if state.get("sql_retries", 0) > 0 else None
@@ -131,6 +261,8 @@ class AnalyticsAgent:
         # Validate
         validation = validate_sql(sql)
         if not validation["valid"]:
+            # Don't replay SQL that can't run the next time this question is asked
+            self.llm.forget(prompt, SQL_SYSTEM_PROMPT)
             return {
                 "sql_query": sql,
                 "sql_result": None,
@@ -141,6 +273,7 @@ class AnalyticsAgent:
         # Execute
         result = self.executor.execute(validation["cleaned_sql"])
         if not result["success"]:
+            self.llm.forget(prompt, SQL_SYSTEM_PROMPT)
             return {
                 "sql_query": validation["cleaned_sql"],
                 "sql_result": None,
@@ -167,6 +300,7 @@ class AnalyticsAgent:
         df = state.get("sql_result")
         if df is None or df.empty:
             return {"calculations": {"error": "No data available"}}
+        from src.calculations.kpi_agent import calculate_kpis
         kpis = calculate_kpis(df, state["intent"], state["query"])
         return {"calculations": kpis}
 
@@ -177,6 +311,7 @@ class AnalyticsAgent:
 
         # Handle fatal SQL error
         if df is None:
+            import pandas as pd
             report = assemble_report(
                 query=state["query"],
                 intent=state.get("intent", "UNKNOWN"),
@@ -186,27 +321,71 @@ class AnalyticsAgent:
                 summary=f"Sorry, I couldn't retrieve data for your question. Error: {state.get('error', 'Unknown')}",
                 chart_figure=None,
                 tables_used=state.get("relevant_tables", []),
+                error=state.get("error") or "Unknown",
             )
             return {"final_report": report}
 
-        # 5a: Generate text summary
-        df_preview = df.head(5).to_string()
-        summary_prompt = build_summary_prompt(state["query"], kpis, df_preview)
+        # 5a + 5b: the summary LLM call runs in the background while the chart is built.
+        # When streaming, an LLM summary is left as None for the caller to fill via stream_summary().
+        template = build_template_summary(state["intent"], df, kpis)
+        if template is None and not state.get("stream_summary"):
+            summary_future = self._pool.submit(self._summarize, state["query"], df, kpis)
+        else:
+            summary_future = None
+        chart_fig = self._build_chart(state, df, kpis)
+        summary = summary_future.result() if summary_future is not None else template
+
+        # 5c: Assemble
+        report = assemble_report(
+            query=state["query"],
+            intent=state["intent"],
+            sql_query=state["sql_query"],
+            df=df,
+            kpis=kpis,
+            summary=summary,
+            chart_figure=chart_fig,
+            tables_used=state.get("relevant_tables", []),
+        )
+        return {"final_report": report}
+
+    def _summarize(self, query: str, df: "pd.DataFrame", kpis: dict) -> str:
+        """Generate the LLM text summary for the report (single-row results use a template instead)."""
+        summary_prompt = build_summary_prompt(query, kpis, build_data_preview(df))
         try:
-            summary = self.llm.generate(summary_prompt, SUMMARY_SYSTEM_PROMPT)
+            return self.llm.generate(summary_prompt, SUMMARY_SYSTEM_PROMPT)
         except Exception as e:
-            summary = f"Data retrieved: {len(df)} rows. KPIs: {kpis}"
+            return f"Data retrieved: {len(df)} rows. KPIs: {kpis}"
+
+    def stream_summary(self, question: str, df: "pd.DataFrame", kpis: dict) -> Iterator[str]:
+        """
+        Yield the LLM summary as it is generated — for reports from ask(..., stream_summary=True),
+        whose "summary" is None. Same prompt and fallback as the blocking summary.
+        """
+        summary_prompt = build_summary_prompt(question, kpis, build_data_preview(df))
+        streamed = False
+        try:
+            for token in self.llm.stream(summary_prompt, SUMMARY_SYSTEM_PROMPT):
+                streamed = True
+                yield token
+        except Exception:
+            # Tokens already shown can't be taken back — only fall back if nothing came through
+            if not streamed:
+                yield f"Data retrieved: {len(df)} rows. KPIs: {kpis}"
 
-        # 5b: Generate chart
+    def _build_chart(self, state: AgentState, df: "pd.DataFrame", kpis: dict):
+        """Auto-chart first, LLM-generated chart code as a fallback."""
         chart_fig = None
         if state["intent"] != "LOOKUP":
             # Try auto-chart first (deterministic, reliable)
             from src.report.chart_generator import auto_chart, build_chart_prompt, execute_chart_code, CHART_SYSTEM_PROMPT
             chart_fig = auto_chart(df, kpis, state["intent"], state["query"])
 
-            # If auto-chart didn't produce anything, try LLM
-            if chart_fig is None and state.get("needs_chart", True):
-                df_info = f"Columns: {list(df.columns)}\nShape: {df.shape}\nFirst 3 rows:\n{df.head(3).to_string()}"
+            # If auto-chart didn't produce anything, try LLM — unless there is
+            # nothing worth plotting (under 3 rows or no numeric column)
+            has_numeric = any(df[c].dtype.kind in "iuf" for c in df.columns)
+            worth_plotting = len(df) >= 3 and has_numeric
+            if chart_fig is None and state.get("needs_chart", True) and worth_plotting:
+                df_info = f"Columns: {list(df.columns)}\nShape: {df.shape}\nFirst 3 rows:\n{df.head(3).to_csv(index=False)}"
                 chart_prompt = build_chart_prompt(
                     state["query"], state["intent"], kpis, df_info
                 )
@@ -223,27 +402,47 @@ class AnalyticsAgent:
                         except Exception:
                             pass
                         retries += 1
-
-        # 5c: Assemble
-        report = assemble_report(
-            query=state["query"],
-            intent=state["intent"],
-            sql_query=state["sql_query"],
-            df=df,
-            kpis=kpis,
-            summary=summary,
-            chart_figure=chart_fig,
-            tables_used=state.get("relevant_tables", []),
-        )
-        return {"final_report": report}
+        return chart_fig
 
     # ---- Public API ----
-    def ask(self, question: str) -> dict:
-        """Run a question through the full pipeline."""
-        initial_state = {
+    def warmup(self) -> dict:
+        """
+        Pay one-off setup costs before the first question: open the LLM keep-alive
+        connection and the SQLite connection, and import the lazily loaded report modules.
+        Returns which components are reachable.
+        """
+        import src.calculations.kpi_agent
+        import src.report.chart_generator
+        return {
+            "llm": self.llm.is_available(),
+            "database": self.executor.test_connection(),
+        }
+
+    def ask(self, question: str, classification: Optional[dict] = None, stream_summary: bool = False) -> dict:
+        """
+        Run a question through the full pipeline.
+        classification: a precomputed {"intent", "needs_chart"} (see classify_batch) — skips intent classification.
+        stream_summary: skip the blocking summary LLM call. The report's "summary" is then None
+        (unless a template summary applied) — stream it with stream_summary(question, report["data"], report["kpis"]).
+        """
+        result = self.graph.invoke(self._initial_state(question, classification, stream_summary))
+        return result["final_report"]
+
+    async def ask_async(self, question: str, classification: Optional[dict] = None) -> dict:
+        """
+        Async variant of ask() — awaitable from an event loop, so many questions can be
+        in flight at once. Nodes still run in worker threads; chart and summary overlap as in ask().
+        """
+        result = await self.graph.ainvoke(self._initial_state(question, classification))
+        return result["final_report"]
+
+    @staticmethod
+    def _initial_state(question: str, classification: Optional[dict] = None, stream_summary: bool = False) -> dict:
+        classification = classification or {}
+        return {
             "query": question,
-            "intent": "",
-            "needs_chart": False,
+            "intent": classification.get("intent", ""),
+            "needs_chart": classification.get("needs_chart", False),
             "relevant_tables": [],
             "schema_context": "",
             "sql_query": "",
@@ -254,8 +453,7 @@ class AnalyticsAgent:
             "chart_retries": 0,
             "chart_output": None,
             "report_summary": "",
+            "stream_summary": stream_summary,
             "final_report": {},
             "error": "",
-        }
-        result = self.graph.invoke(initial_state)
-        return result["final_report"]
\ No newline at end of file
+        }
\ No newline at end of file
@@ -3,21 +3,59 @@ Deterministic KPI calculations using Pandas.
 No LLM involved — pure math on actual data.
 Handles both raw multi-row data AND pre-aggregated single-row results.
 """
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 
+# Frames at least this large run independent groupbys on a thread pool
+# (pandas releases the GIL in its groupby kernels; below this, thread startup dominates)
+PARALLEL_GROUPBY_MIN_ROWS = 100_000
+
+# Columns that only appear in raw (not pre-aggregated) rows
+RAW_DATA_COLUMNS = frozenset({
+    "quantity_planned", "quantity_actual", "start_time",
+    "cycle_time_minutes", "line_id", "shift_id",
+})
+
+
+def _run_groupbys(tasks: dict, n_rows: int) -> dict:
+    """Run independent groupby callables, concurrently for large frames."""
+    if n_rows < PARALLEL_GROUPBY_MIN_ROWS or len(tasks) < 2:
+        return {name: fn() for name, fn in tasks.items()}
+    with ThreadPoolExecutor(max_workers=min(4, len(tasks))) as pool:
+        futures = {name: pool.submit(fn) for name, fn in tasks.items()}
+        return {name: f.result() for name, f in futures.items()}
+
+
+def _ensure_dt(s: pd.Series) -> pd.Series:
+    """Parse a datetime column, skipping the parse when it is already datetime64."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    try:
+        # Dates are stored as ISO text — the explicit format takes pandas' fast C parser
+        return pd.to_datetime(s, format="ISO8601")
+    except (ValueError, TypeError):
+        # e.g. time-only shift values ("06:00:00") — fall back to inference
+        return pd.to_datetime(s, errors="coerce")
+
+
+def _fix_overnight(duration: np.ndarray) -> np.ndarray:
+    """Fix overnight shifts (negative duration means crosses midnight)."""
+    return np.where(duration < 0, duration + 1440.0, duration)
+
 
 def calculate_kpis(df: pd.DataFrame, intent: str, query: str) -> dict:
     """
     Compute KPIs based on the dataframe and intent type.
+    Expects lowercase column names (SQLExecutor lowercases its results).
     Returns a dict of calculated metrics.
     """
     if df is None or df.empty:
         return {"error": "No data to calculate KPIs from"}
 
     kpis = {}
-    cols = [c.lower() for c in df.columns]
-    df.columns = [c.lower() for c in df.columns]
+    cols = df.columns
 
     # ---- Handle pre-aggregated results (1-5 rows from GROUP BY / COUNT) ----
     if len(df) <= 5 and len(df.columns) <= 5:
@@ -29,6 +67,16 @@ def calculate_kpis(df: pd.DataFrame, intent: str, query: str) -> dict:
                 # Multiple rows — probably a GROUP BY result
                 kpis[col] = values
 
+        # Nothing raw left to break down — skip every block below
+        if intent in ("LOOKUP", "AGGREGATION") and not RAW_DATA_COLUMNS.intersection(cols):
+            kpis["row_count"] = len(df)
+            return kpis
+
+    # Numeric columns as one float matrix so reductions run column-wise in NumPy
+    numeric = df.select_dtypes(include=[np.number])
+    numeric_cols = numeric.columns
+    numeric_arr = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+
     # ---- Yield calculations (when raw order data is present) ----
     if "quantity_planned" in cols and "quantity_actual" in cols:
         df["yield_pct"] = (df["quantity_actual"] / df["quantity_planned"] * 100).round(2)
@@ -43,12 +91,21 @@ def calculate_kpis(df: pd.DataFrame, intent: str, query: str) -> dict:
         )
 
     # ---- Yield % column already computed by SQL ----
-    for col in cols:
-        if "yield" in col or "efficiency" in col or "ratio" in col:
-            if df[col].dtype in ["float64", "int64", "float32"]:
-                kpis[f"avg_{col}"] = round(df[col].mean(), 2)
-                kpis[f"min_{col}"] = round(df[col].min(), 2)
-                kpis[f"max_{col}"] = round(df[col].max(), 2)
+    ratio_idx = [i for i, c in enumerate(numeric_cols)
+                 if "yield" in c or "efficiency" in c or "ratio" in c]
+    if ratio_idx:
+        ratio_arr = numeric_arr[:, ratio_idx]
+        with warnings.catch_warnings():
+            # All-NaN columns reduce to NaN, same as pandas
+            warnings.simplefilter("ignore", RuntimeWarning)
+            means = np.nanmean(ratio_arr, axis=0)
+            mins = np.nanmin(ratio_arr, axis=0)
+            maxs = np.nanmax(ratio_arr, axis=0)
+        for j, i in enumerate(ratio_idx):
+            col = numeric_cols[i]
+            kpis[f"avg_{col}"] = round(means[j], 2)
+            kpis[f"min_{col}"] = round(mins[j], 2)
+            kpis[f"max_{col}"] = round(maxs[j], 2)
 
     # ---- Order counts ----
     if "order_id" in cols:
@@ -59,15 +116,19 @@ def calculate_kpis(df: pd.DataFrame, intent: str, query: str) -> dict:
         kpis["completed_orders"] = int(status_counts.get("completed", 0))
 
     # ---- Time calculations ----
+    # Parsed datetime columns, reused by the trend block
+    parsed_times = {}
     if "start_time" in cols and "end_time" in cols:
         try:
-            start = pd.to_datetime(df["start_time"], errors="coerce")
-            end = pd.to_datetime(df["end_time"], errors="coerce")
-            valid = start.notna() & end.notna()
+            start = _ensure_dt(df["start_time"])
+            end = _ensure_dt(df["end_time"])
+            parsed_times["start_time"] = start
+            parsed_times["end_time"] = end
+            # NaT on either side gives NaN — one mask over the raw minutes array
+            minutes = ((end - start).dt.total_seconds() / 60).to_numpy(dtype=np.float64)
+            valid = ~np.isnan(minutes)
             if valid.any():
-                duration = (end[valid] - start[valid]).dt.total_seconds() / 60
-                # Fix overnight shifts (negative duration means crosses midnight)
-                duration = duration.apply(lambda x: x + 1440 if x < 0 else x)
+                duration = _fix_overnight(minutes[valid])
                 kpis["avg_duration_min"] = round(duration.mean(), 1)
                 kpis["min_duration_min"] = round(duration.min(), 1)
                 kpis["max_duration_min"] = round(duration.max(), 1)
@@ -94,31 +155,48 @@ def calculate_kpis(df: pd.DataFrame, intent: str, query: str) -> dict:
     if "operator_id" in cols:
         kpis["unique_operators"] = int(df["operator_id"].nunique())
     if "name" in cols:
-        kpis["staff_names"] = df["name"].unique().tolist()
+        kpis["staff_names"] = df["name"].drop_duplicates().to_numpy().tolist()
 
-    # ---- Line breakdown ----
+    # ---- Line / product / supervisor breakdowns ----
+    # Independent groupby reductions — collected first, run together below
+    line_aggs = {}
     if "line_id" in cols and "quantity_actual" in cols:
-        line_totals = df.groupby("line_id")["quantity_actual"].sum()
-        kpis["output_by_line"] = {k: round(v, 2) for k, v in line_totals.items()}
-        kpis["best_line"] = line_totals.idxmax()
-        kpis["worst_line"] = line_totals.idxmin()
-
+        line_aggs["quantity_actual"] = "sum"
     if "line_id" in cols and "yield_pct" in df.columns:
-        line_yield = df.groupby("line_id")["yield_pct"].mean().round(2)
-        kpis["yield_by_line"] = line_yield.to_dict()
+        line_aggs["yield_pct"] = "mean"
 
-    # ---- Product breakdown ----
+    groupbys = {}
+    if line_aggs:
+        # One groupby for all per-line aggregations
+        groupbys["line"] = lambda: df.groupby("line_id").agg(line_aggs)
     if "product_id" in cols and "quantity_actual" in cols:
-        prod_totals = df.groupby("product_id")["quantity_actual"].sum()
-        kpis["output_by_product"] = {k: round(v, 2) for k, v in prod_totals.items()}
-
+        groupbys["product"] = lambda: df.groupby("product_id")["quantity_actual"].sum()
     if "product_name" in cols and "quantity_actual" in cols:
-        prod_totals = df.groupby("product_name")["quantity_actual"].sum()
-        kpis["output_by_product_name"] = {k: round(v, 2) for k, v in prod_totals.items()}
+        groupbys["product_name"] = lambda: df.groupby("product_name")["quantity_actual"].sum()
+    if "supervisor_id" in cols and "yield_pct" in df.columns:
+        groupbys["supervisor"] = lambda: df.groupby("supervisor_id")["yield_pct"].mean().round(2)
+
+    grouped = _run_groupbys(groupbys, len(df))
+
+    if "line" in grouped:
+        by_line = grouped["line"]
+        if "quantity_actual" in line_aggs:
+            line_totals = by_line["quantity_actual"]
+            kpis["output_by_line"] = line_totals.round(2).to_dict()
+            kpis["best_line"] = line_totals.idxmax()
+            kpis["worst_line"] = line_totals.idxmin()
+        if "yield_pct" in line_aggs:
+            kpis["yield_by_line"] = by_line["yield_pct"].round(2).to_dict()
+
+    if "product" in grouped:
+        kpis["output_by_product"] = grouped["product"].round(2).to_dict()
+
+    if "product_name" in grouped:
+        kpis["output_by_product_name"] = grouped["product_name"].round(2).to_dict()
 
     # ---- Supervisor performance ----
-    if "supervisor_id" in cols and "yield_pct" in df.columns:
-        sup_yield = df.groupby("supervisor_id")["yield_pct"].mean().round(2)
+    if "supervisor" in grouped:
+        sup_yield = grouped["supervisor"]
         kpis["yield_by_supervisor"] = sup_yield.to_dict()
         kpis["best_supervisor"] = sup_yield.idxmax()
 
@@ -130,7 +208,7 @@ def calculate_kpis(df: pd.DataFrame, intent: str, query: str) -> dict:
 
         # Generic: group by first text column, aggregate first numeric column
         text_cols = [c for c in df.columns if df[c].dtype == "object" and c not in ("order_id", "shift_id", "step_id")]
-        num_cols = [c for c in df.columns if df[c].dtype in ["float64", "int64"]]
+        num_cols = list(numeric_cols)
         if text_cols and num_cols:
             group_col = text_cols[0]
             val_col = num_cols[0]
@@ -147,25 +225,31 @@ def calculate_kpis(df: pd.DataFrame, intent: str, query: str) -> dict:
                 date_col = c
                 break
 
-        num_cols = [c for c in df.columns if df[c].dtype in ["float64", "int64", "float32"]
-                    and "id" not in c and c != "step_number"]
+        num_cols = [c for c in numeric_cols if "id" not in c and c != "step_number"]
         if date_col and num_cols:
             val_col = "yield_pct" if "yield_pct" in df.columns else num_cols[0]
             try:
                 if date_col in ("start_time", "end_time"):
-                    df["_date"] = pd.to_datetime(df[date_col], errors="coerce").dt.date.astype(str)
+                    dates = parsed_times.get(date_col)
+                    if dates is None:
+                        dates = _ensure_dt(df[date_col])
+                    df["_date"] = dates.dt.date.astype(str)
                     daily = df.groupby("_date")[val_col].mean().round(2)
                 else:
                     daily = df.groupby(date_col)[val_col].mean().round(2)
 
-                kpis["trend_data"] = {str(k): v for k, v in daily.items()}
+                kpis["trend_data"] = dict(zip(daily.index.astype(str), daily.tolist()))
                 kpis["trend_metric"] = val_col
 
                 if len(daily) >= 3:
-                    x = np.arange(len(daily))
-                    slope, intercept = np.polyfit(x, daily.values, 1)
-                    kpis["trend_slope"] = round(slope, 3)
-                    kpis["trend_direction"] = "improving" if slope > 0 else "declining"
+                    # Closed-form least-squares slope — no Vandermonde/lstsq setup
+                    y = daily.to_numpy(dtype=np.float64)
+                    x = np.arange(len(y), dtype=np.float64)
+                    dx = x - x.mean()
+                    slope = np.dot(dx, y - y.mean()) / np.dot(dx, dx)
+                    if np.isfinite(slope):
+                        kpis["trend_slope"] = round(slope, 3)
+                        kpis["trend_direction"] = "improving" if slope > 0 else "declining"
             except Exception:
                 pass
 
@@ -0,0 +1,112 @@
+"""
+In-process cache for LLM responses.
+Repeated prompts are answered from memory instead of a new LLM round trip.
+"""
+import atexit
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+class PromptCache:
+    def __init__(self, max_entries: int = 10000, path: str = None, save_every: int = 50):
+        """
+        LRU cache of LLM responses, namespaced by system prompt.
+        If `path` is set, entries are loaded from and persisted to that pickle file —
+        rewritten every `save_every` changes and on interpreter exit, not on every put.
+        """
+        self.max_entries = max_entries
+        self.path = path
+        self.save_every = max(1, save_every)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            if os.path.exists(path):
+                self._load()
+            atexit.register(self.flush)
+
+    @staticmethod
+    def _key(prompt: str, system_prompt: str) -> tuple:
+        """Namespace by system prompt hash, normalize whitespace in the prompt."""
+        namespace = hashlib.sha1(system_prompt.encode("utf-8")).hexdigest()[:16]
+        return namespace, " ".join(prompt.split())
+
+    def get(self, prompt: str, system_prompt: str = ""):
+        """Return the cached response, or None on a miss."""
+        key = self._key(prompt, system_prompt)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, prompt: str, system_prompt: str, response: str):
+        """Store a response, evicting the least recently used entry when full."""
+        key = self._key(prompt, system_prompt)
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            save_due = self._unsaved >= self.save_every
+        if save_due:
+            self.flush()
+
+    def discard(self, prompt: str, system_prompt: str = ""):
+        """Drop one cached response, e.g. an answer that turned out to be unusable."""
+        key = self._key(prompt, system_prompt)
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return
+            self._unsaved += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._unsaved += 1
+        self.flush()
+
+    def flush(self):
+        """Write the cache to `path` if anything changed since the last save."""
+        if not self.path:
+            return
+        with self._save_lock:
+            # Snapshot under the lock, pickle and write outside it — lookups aren't blocked on disk I/O
+            with self._lock:
+                if not self._unsaved:
+                    return
+                snapshot = self._entries.copy()
+                self._unsaved = 0
+            self._save(snapshot)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                entries = pickle.load(f)
+            self._entries = OrderedDict(list(entries.items())[-self.max_entries:])
+        except Exception:
+            # Corrupt or incompatible cache file — start empty
+            self._entries = OrderedDict()
+
+    def _save(self, entries: OrderedDict):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # Persistence is best-effort — the in-memory cache still works
+            pass
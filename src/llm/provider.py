@@ -3,14 +3,32 @@ LLM provider abstraction.
 Switch between Ollama and Anthropic via .env config.
 """
 import os
-import json
+import threading
+from typing import Iterator, Optional
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+from src.llm.cache import PromptCache
+
 load_dotenv()
 
+# Payloads are serialized with orjson and sent as raw bytes
+_JSON_HEADERS = {"content-type": "application/json"}
+_ANTHROPIC_URL = "https://api.anthropic.com/v1/messages"
+
+
+def _reached_stop(text: str, stop_on: str) -> bool:
+    """True once stop_on has been generated and every '{' so far is closed."""
+    return stop_on in text and text.count("{") <= text.count("}")
+
 
 class LLMProvider:
+    _shared_session = None
+    _session_lock = threading.Lock()
+
     def __init__(self):
         self.provider = os.getenv("LLM_PROVIDER", "ollama")
         
@@ -25,26 +43,139 @@ class LLMProvider:
         else:
             raise ValueError(f"Unknown LLM_PROVIDER: {self.provider}")
 
-    def generate(self, prompt: str, system_prompt: str = "") -> str:
-        """Send prompt to LLM, return text response."""
+        # Repeated prompts skip the LLM round trip entirely
+        # A persisted cache is rewritten every LLM_CACHE_SAVE_EVERY new responses and at exit
+        self.cache = PromptCache(
+            path=os.getenv("LLM_CACHE_PATH") or None,
+            save_every=int(os.getenv("LLM_CACHE_SAVE_EVERY", "50")),
+        )
+        self._session = self._get_session()
+
+    @classmethod
+    def _get_session(cls) -> requests.Session:
+        """Keep-alive session shared by all provider instances (no handshake per call)."""
+        with cls._session_lock:
+            if cls._shared_session is None:
+                retry = Retry(
+                    total=2,
+                    backoff_factor=0.1,
+                    status_forcelist=[500, 502, 503],
+                    allowed_methods=frozenset({"GET", "POST"}),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                cls._shared_session = session
+            return cls._shared_session
+
+    def generate(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        stop_on: Optional[str] = None,
+        format: Optional[dict] = None,
+    ) -> str:
+        """
+        Send prompt to LLM, return text response.
+        stop_on: stop reading the Ollama stream once this string has been generated
+        and every '{' so far is closed — e.g. "}" for single JSON-object answers.
+        format: JSON schema the response must follow — the response is then a JSON string.
+        """
+        cache_ns = self._cache_namespace(system_prompt, format)
+        cached = self.cache.get(prompt, cache_ns)
+        if cached is not None:
+            return cached
+
+        if self.provider == "ollama":
+            response = self._ollama_generate(prompt, system_prompt, stop_on, format)
+        else:
+            response = self._anthropic_generate(prompt, system_prompt, format)
+
+        self.cache.put(prompt, cache_ns, response)
+        return response
+
+    def stream(self, prompt: str, system_prompt: str = "") -> Iterator[str]:
+        """
+        Like generate(), but yields the response text as it is produced.
+        A cache hit is yielded in one piece; the full response is cached once the stream completes.
+        """
+        cache_ns = self._cache_namespace(system_prompt)
+        cached = self.cache.get(prompt, cache_ns)
+        if cached is not None:
+            yield cached
+            return
+
         if self.provider == "ollama":
-            return self._ollama_generate(prompt, system_prompt)
+            tokens = self._ollama_stream(prompt, system_prompt)
         else:
-            return self._anthropic_generate(prompt, system_prompt)
+            tokens = self._anthropic_stream(prompt, system_prompt)
 
-    def _ollama_generate(self, prompt: str, system_prompt: str) -> str:
-        """Call Ollama local API."""
+        parts = []
+        for token in tokens:
+            parts.append(token)
+            yield token
+        self.cache.put(prompt, cache_ns, "".join(parts).strip())
+
+    def forget(self, prompt: str, system_prompt: str = "", format: Optional[dict] = None):
+        """Drop the cached response for this prompt, so the next generate() asks the LLM again."""
+        self.cache.discard(prompt, self._cache_namespace(system_prompt, format))
+
+    def _cache_namespace(self, system_prompt: str, format: Optional[dict] = None) -> str:
+        # Namespaced by model (a persisted cache must not answer for another model),
+        # and schema-constrained responses are cached apart from free-form ones
+        cache_ns = f"{self.provider}/{self.model}\n{system_prompt}"
+        if format is not None:
+            cache_ns += f"\n{orjson.dumps(format, option=orjson.OPT_SORT_KEYS).decode()}"
+        return cache_ns
+
+    def _ollama_generate(
+        self,
+        prompt: str,
+        system_prompt: str,
+        stop_on: Optional[str] = None,
+        format: Optional[dict] = None,
+    ) -> str:
+        """Call Ollama local API, reading the response as a token stream."""
+        parts = []
+        tokens = self._ollama_stream(prompt, system_prompt, format)
+        try:
+            for token in tokens:
+                parts.append(token)
+                # Closing the stream early also stops generation server-side
+                if stop_on and stop_on in token and _reached_stop("".join(parts), stop_on):
+                    break
+        finally:
+            tokens.close()
+        return "".join(parts).strip()
+
+    def _ollama_stream(self, prompt: str, system_prompt: str, format: Optional[dict] = None) -> Iterator[str]:
+        """Yield response tokens from the Ollama generate API as they arrive."""
         url = f"{self.base_url}/api/generate"
         payload = {
             "model": self.model,
             "prompt": prompt,
             "system": system_prompt,
-            "stream": False,
+            "stream": True,
         }
+        if format is not None:
+            # Grammar-constrained decoding — only tokens valid under the schema
+            payload["format"] = format
         try:
-            resp = requests.post(url, json=payload, timeout=120)
-            resp.raise_for_status()
-            return resp.json()["response"].strip()
+            with self._session.post(
+                url, data=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=120, stream=True
+            ) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if not line:
+                        continue
+                    chunk = orjson.loads(line)
+                    if "error" in chunk:
+                        raise RuntimeError(chunk["error"])
+                    yield chunk.get("response", "")
+                    if chunk.get("done"):
+                        break
         except requests.ConnectionError:
             raise ConnectionError(
                 f"Cannot connect to Ollama at {self.base_url}. "
@@ -53,12 +184,12 @@ class LLMProvider:
         except Exception as e:
             raise RuntimeError(f"Ollama error: {e}")
 
-    def _anthropic_generate(self, prompt: str, system_prompt: str) -> str:
-        """Call Anthropic Messages API."""
-        url = "https://api.anthropic.com/v1/messages"
+    def _anthropic_request(self, prompt: str, system_prompt: str, format: Optional[dict] = None) -> tuple:
+        """Headers and payload for the Anthropic Messages API."""
         headers = {
             "x-api-key": self.api_key,
             "anthropic-version": "2023-06-01",
+            "anthropic-beta": "prompt-caching-2024-07-31",
             "content-type": "application/json",
         }
         payload = {
@@ -67,21 +198,64 @@ class LLMProvider:
             "messages": [{"role": "user", "content": prompt}],
         }
         if system_prompt:
-            payload["system"] = system_prompt
+            # System prompts are module-level constants, so the prefix is byte-identical
+            # across calls — mark it cacheable on the provider side
+            payload["system"] = [{
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {"type": "ephemeral"},
+            }]
+        if format is not None:
+            # Structured output via a forced tool call with the schema as its input
+            payload["tools"] = [{
+                "name": "respond",
+                "description": "Return the answer as structured data.",
+                "input_schema": format,
+            }]
+            payload["tool_choice"] = {"type": "tool", "name": "respond"}
+        return headers, payload
 
+    def _anthropic_generate(self, prompt: str, system_prompt: str, format: Optional[dict] = None) -> str:
+        """Call Anthropic Messages API."""
+        headers, payload = self._anthropic_request(prompt, system_prompt, format)
         try:
-            resp = requests.post(url, headers=headers, json=payload, timeout=60)
+            resp = self._session.post(_ANTHROPIC_URL, headers=headers, data=orjson.dumps(payload), timeout=60)
             resp.raise_for_status()
-            data = resp.json()
+            data = orjson.loads(resp.content)
+            if format is not None:
+                tool_use = next(b for b in data["content"] if b["type"] == "tool_use")
+                return orjson.dumps(tool_use["input"]).decode()
             return data["content"][0]["text"].strip()
         except Exception as e:
             raise RuntimeError(f"Anthropic API error: {e}")
 
+    def _anthropic_stream(self, prompt: str, system_prompt: str) -> Iterator[str]:
+        """Yield text deltas from the Anthropic Messages API's server-sent events."""
+        headers, payload = self._anthropic_request(prompt, system_prompt)
+        payload["stream"] = True
+        try:
+            with self._session.post(
+                _ANTHROPIC_URL, headers=headers, data=orjson.dumps(payload), timeout=60, stream=True
+            ) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue
+                    event = orjson.loads(line[5:])
+                    if event["type"] == "error":
+                        raise RuntimeError(event["error"])
+                    if event["type"] == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                        yield event["delta"]["text"]
+                    elif event["type"] == "message_stop":
+                        break
+        except Exception as e:
+            raise RuntimeError(f"Anthropic API error: {e}")
+
     def is_available(self) -> bool:
         """Check if the LLM is reachable."""
         try:
             if self.provider == "ollama":
-                resp = requests.get(f"{self.base_url}/api/tags", timeout=5)
+                resp = self._session.get(f"{self.base_url}/api/tags", timeout=5)
                 return resp.status_code == 200
             else:
                 # Anthropic — just check key exists
@@ -13,8 +13,9 @@ def assemble_report(
     summary: str,
     chart_figure,
     tables_used: list,
+    error: str = None,
 ) -> dict:
-    """Build the final report dict."""
+    """Build the final report dict. error is set when no data could be retrieved."""
     report = {
         "query": query,
         "intent": intent,
@@ -26,5 +27,6 @@ def assemble_report(
         "row_count": len(df) if df is not None else 0,
         "data": df,
         "timestamp": datetime.now().isoformat(),
+        "error": error,
     }
     return report
\ No newline at end of file
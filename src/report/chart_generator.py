@@ -2,11 +2,22 @@
 Generates Plotly charts via LLM or deterministically based on intent + data.
 Falls back to auto-chart if LLM-generated code fails.
 """
+from functools import lru_cache
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 import numpy as np
 
+# Plotly's default qualitative colours; the 4-colour slice is used for KPI bar charts
+_PALETTE = ("#636EFA", "#EF553B", "#00CC96", "#AB63FA", "#FFA15A", "#19D3F3", "#FF6692")
+_PALETTE_SHORT = _PALETTE[:4]
+
+# Above this many bars, switch to a WebGL trace — SVG bars get slow past a few hundred marks
+WEBGL_THRESHOLD = 200
+
+# Trend lines longer than this are downsampled with LTTB before plotting
+TREND_MAX_POINTS = 2000
+
 CHART_SYSTEM_PROMPT = """You are a Python data visualization expert.
 Generate Plotly code to create a chart for manufacturing data.
 
@@ -20,6 +31,7 @@ RULES:
 - Return ONLY Python code, no explanation, no markdown, no backticks
 - Do NOT call fig.show()
 - Do NOT import anything — go, pd, np are already available
+- Do NOT modify `df` in place (no inplace=True, no assigning into existing columns) — build new objects instead
 """
 
 
@@ -49,6 +61,12 @@ DATAFRAME INFO:
 Generate Plotly code. `df`, `kpis`, `go`, `pd`, `np` are available. Assign to `fig`."""
 
 
+@lru_cache(maxsize=128)
+def _compile_chart_code(code: str):
+    """Compile chart code once — the LLM often returns identical code for recurring questions."""
+    return compile(code, "<chart>", "exec")
+
+
 def execute_chart_code(code: str, df: pd.DataFrame, kpis: dict) -> dict:
     """Safely execute LLM-generated chart code."""
     try:
@@ -58,8 +76,10 @@ def execute_chart_code(code: str, df: pd.DataFrame, kpis: dict) -> dict:
             lines = [l for l in lines if not l.strip().startswith("```")]
             clean = "\n".join(lines)
 
+        # Deep copy: the code is LLM-generated and may write into df — a shallow copy would
+        # share buffers with the caller's frame (and the executor's result cache)
         local_vars = {"df": df.copy(), "kpis": kpis, "go": go, "px": px, "pd": pd, "np": np}
-        exec(clean, {"__builtins__": {"range": range, "len": len, "list": list, "dict": dict,
+        exec(_compile_chart_code(clean), {"__builtins__": {"range": range, "len": len, "list": list, "dict": dict,
                                        "str": str, "int": int, "float": float, "round": round,
                                        "enumerate": enumerate, "zip": zip, "sorted": sorted,
                                        "min": min, "max": max, "sum": sum, "abs": abs}},
@@ -75,13 +95,74 @@ def execute_chart_code(code: str, df: pd.DataFrame, kpis: dict) -> dict:
         return {"success": False, "error": str(e), "figure": None}
 
 
+def _bar(n: int, x, y, texttemplate: str, marker_color):
+    """go.Bar for small charts, a WebGL scatter (no per-bar labels) for large ones."""
+    if n <= WEBGL_THRESHOLD:
+        return go.Bar(x=x, y=y, texttemplate=texttemplate, textposition="auto",
+                      marker_color=marker_color)
+    return go.Scattergl(x=x, y=y, mode="markers", marker=dict(color=_PALETTE[0]))
+
+
+def _lttb(x: np.ndarray, y: np.ndarray, n_out: int = TREND_MAX_POINTS) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Returns the indices of the n_out points that best preserve the line's visual shape.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    # First and last points are always kept; the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the triangle's third vertex
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        areas = np.abs(
+            (x[prev] - next_x) * (y[start:end] - y[prev])
+            - (x[prev] - x[start:end]) * (next_y - y[prev])
+        )
+        prev = start + int(np.argmax(areas))
+        selected[i + 1] = prev
+
+    return selected
+
+
+def _mean_by(keys: pd.Series, vals: pd.Series) -> tuple:
+    """
+    Per-key mean of vals, rounded to 2 dp — a NumPy stand-in for groupby().mean()
+    on the small frames charted here. Like groupby, NaN keys are dropped and NaN values skipped.
+    Returns (sorted unique keys, means) as arrays.
+    """
+    keep = keys.notna().to_numpy()
+    values = vals.to_numpy(dtype=float)[keep]
+    uniques, inverse = np.unique(keys.to_numpy()[keep], return_inverse=True)
+    valid = ~np.isnan(values)
+    sums = np.bincount(inverse, weights=np.where(valid, values, 0.0), minlength=len(uniques))
+    counts = np.bincount(inverse, weights=valid, minlength=len(uniques))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    return uniques, np.round(means, 2)
+
+
 def auto_chart(df: pd.DataFrame, kpis: dict, intent: str, query: str) -> go.Figure:
     """
     Deterministic chart generation — no LLM needed.
     Fallback when LLM chart code fails, or primary for simple cases.
     """
-    df = df.copy()
+    # Shallow copy — only the column labels are reassigned; everything below just reads the data
+    df = df.copy(deep=False)
     df.columns = [c.lower() for c in df.columns]
+    cols_set = set(df.columns)
     fig = None
 
     try:
@@ -89,6 +170,12 @@ def auto_chart(df: pd.DataFrame, kpis: dict, intent: str, query: str) -> go.Figu
         if intent == "TREND" and "trend_data" in kpis:
             dates = list(kpis["trend_data"].keys())
             values = list(kpis["trend_data"].values())
+            if len(dates) > TREND_MAX_POINTS:
+                # Buckets are positional — trend_data is already in date order
+                y = np.asarray(values, dtype=float)
+                keep = _lttb(np.arange(len(y), dtype=float), y)
+                dates = [dates[i] for i in keep]
+                values = y[keep]
             metric = kpis.get("trend_metric", "value")
             fig = go.Figure()
             fig.add_trace(go.Scatter(
@@ -114,9 +201,9 @@ def auto_chart(df: pd.DataFrame, kpis: dict, intent: str, query: str) -> go.Figu
             fig = go.Figure()
             fig.add_trace(go.Bar(
                 x=categories, y=values,
-                text=[f"{v:.1f}" for v in values],
+                texttemplate="%{y:.1f}",
                 textposition="auto",
-                marker_color=["#636EFA", "#EF553B", "#00CC96", "#AB63FA"][:len(categories)],
+                marker_color=list(_PALETTE_SHORT[:len(categories)]),
             ))
             fig.update_layout(
                 title=f"Comparison: {metric.replace('_', ' ').title()}",
@@ -129,25 +216,22 @@ def auto_chart(df: pd.DataFrame, kpis: dict, intent: str, query: str) -> go.Figu
         # ---- REPORT: Step timeline or order breakdown ----
         if intent == "REPORT":
             # If steps are present, show step-level bar chart
-            if "step_name" in [c.lower() for c in df.columns]:
+            if "step_name" in cols_set:
                 step_col = "step_name"
-                if "yield_pct" in df.columns:
+                if "yield_pct" in cols_set:
                     val_col = "yield_pct"
-                elif "quantity_actual" in [c.lower() for c in df.columns]:
+                elif "quantity_actual" in cols_set:
                     val_col = "quantity_actual"
                 else:
                     val_col = None
 
                 if val_col:
-                    step_data = df.groupby(step_col)[val_col].mean().round(2)
+                    steps, step_means = _mean_by(df[step_col], df[val_col])
                     fig = go.Figure()
-                    fig.add_trace(go.Bar(
-                        x=step_data.index.tolist(),
-                        y=step_data.values.tolist(),
-                        text=[f"{v:.1f}" for v in step_data.values],
-                        textposition="auto",
-                        marker_color=["#636EFA", "#EF553B", "#00CC96", "#AB63FA",
-                                      "#FFA15A", "#19D3F3", "#FF6692"][:len(step_data)],
+                    fig.add_trace(_bar(
+                        len(steps), steps, step_means,
+                        texttemplate="%{y:.1f}",
+                        marker_color=list(_PALETTE[:len(steps)]),
                     ))
                     fig.update_layout(
                         title="Breakdown by Production Step",
@@ -158,15 +242,13 @@ def auto_chart(df: pd.DataFrame, kpis: dict, intent: str, query: str) -> go.Figu
                     return fig
 
             # If orders are present, show per-order yield
-            if "order_id" in [c.lower() for c in df.columns] and "yield_pct" in df.columns:
-                order_yield = df.groupby("order_id")["yield_pct"].mean().round(2)
+            if "order_id" in cols_set and "yield_pct" in cols_set:
+                orders, order_yield = _mean_by(df["order_id"], df["yield_pct"])
                 fig = go.Figure()
-                fig.add_trace(go.Bar(
-                    x=order_yield.index.tolist(),
-                    y=order_yield.values.tolist(),
-                    text=[f"{v:.1f}%" for v in order_yield.values],
-                    textposition="auto",
-                    marker_color="#636EFA",
+                fig.add_trace(_bar(
+                    len(orders), orders, order_yield,
+                    texttemplate="%{y:.1f}%",
+                    marker_color=_PALETTE[0],
                 ))
                 fig.update_layout(
                     title="Yield by Order",
@@ -183,9 +265,9 @@ def auto_chart(df: pd.DataFrame, kpis: dict, intent: str, query: str) -> go.Figu
             fig = go.Figure()
             fig.add_trace(go.Bar(
                 x=lines, y=yields,
-                text=[f"{v:.1f}%" for v in yields],
+                texttemplate="%{y:.1f}%",
                 textposition="auto",
-                marker_color=["#636EFA", "#EF553B", "#00CC96", "#AB63FA"][:len(lines)],
+                marker_color=list(_PALETTE_SHORT[:len(lines)]),
             ))
             fig.update_layout(
                 title="Yield by Production Line",
@@ -202,9 +284,9 @@ def auto_chart(df: pd.DataFrame, kpis: dict, intent: str, query: str) -> go.Figu
             fig = go.Figure()
             fig.add_trace(go.Bar(
                 x=sups, y=yields,
-                text=[f"{v:.1f}%" for v in yields],
+                texttemplate="%{y:.1f}%",
                 textposition="auto",
-                marker_color=["#636EFA", "#EF553B", "#00CC96", "#AB63FA"][:len(sups)],
+                marker_color=list(_PALETTE_SHORT[:len(sups)]),
             ))
             fig.update_layout(
                 title="Yield by Supervisor",
@@ -221,9 +303,9 @@ def auto_chart(df: pd.DataFrame, kpis: dict, intent: str, query: str) -> go.Figu
             fig = go.Figure()
             fig.add_trace(go.Bar(
                 x=products, y=amounts,
-                text=[f"{v:,.0f}" for v in amounts],
+                texttemplate="%{y:,.0f}",
                 textposition="auto",
-                marker_color=["#636EFA", "#EF553B", "#00CC96", "#AB63FA"][:len(products)],
+                marker_color=list(_PALETTE_SHORT[:len(products)]),
             ))
             fig.update_layout(
                 title="Output by Product",
@@ -245,7 +327,7 @@ def auto_chart(df: pd.DataFrame, kpis: dict, intent: str, query: str) -> go.Figu
             fig.add_trace(go.Bar(
                 x=df[x_col].tolist(),
                 y=df[y_col].tolist(),
-                marker_color="#636EFA",
+                marker_color=_PALETTE[0],
             ))
             fig.update_layout(
                 title=f"{y_col.replace('_', ' ').title()} by {x_col.replace('_', ' ').title()}",
@@ -1,7 +1,10 @@
 """
 Generates plain English summary from KPI data using LLM.
 Numbers come from Pandas — LLM only writes the words around them.
+Trivial single-row results get a template summary with no LLM call.
 """
+from numbers import Integral, Real
+from typing import Optional
 
 SUMMARY_SYSTEM_PROMPT = """You are a manufacturing analytics assistant.
 Write a concise 2-3 sentence summary answering the user's question.
@@ -24,4 +27,64 @@ CALCULATED KPIs:
 DATA PREVIEW (first 5 rows):
 {df_preview}
 
-Write a 2-3 sentence summary answering the user's question using ONLY the numbers above."""
\ No newline at end of file
+Write a 2-3 sentence summary answering the user's question using ONLY the numbers above."""
+
+
+def _preview_cell(value) -> str:
+    # Missing values print empty, like to_csv
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return "" if value != value else f"{value:.2f}"
+    return str(value)
+
+
+def build_data_preview(df, n: int = 5) -> str:
+    """
+    Compact CSV-style preview of the first n rows for the summary prompt.
+    Plain joins over itertuples — no pandas formatting machinery, no alignment padding.
+    """
+    header = ",".join(map(str, df.columns))
+    rows = (",".join(map(_preview_cell, row)) for row in df.head(n).itertuples(index=False, name=None))
+    return "\n".join([header, *rows])
+
+
+def _fmt(value) -> str:
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, Integral):
+        return f"{value:,}"
+    if isinstance(value, Real):
+        return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+    return str(value)
+
+
+def build_template_summary(intent: str, df, kpis: dict) -> Optional[str]:
+    """
+    Deterministic summary for single-row LOOKUP/AGGREGATION results.
+    Returns None when the result needs a real LLM summary.
+    """
+    if intent not in ("LOOKUP", "AGGREGATION") or df is None or len(df) != 1:
+        return None
+
+    row = df.iloc[0]
+    cols = set(df.columns)
+
+    # Single order lookup
+    if intent == "LOOKUP" and {"order_id", "line_id", "quantity_actual", "quantity_planned"} <= cols:
+        summary = (
+            f"Order {row['order_id']} on line {row['line_id']} produced "
+            f"{_fmt(row['quantity_actual'])} vs {_fmt(row['quantity_planned'])} planned"
+        )
+        if "avg_yield" in kpis:
+            summary += f" ({_fmt(kpis['avg_yield'])}% yield)"
+        if "status" in cols:
+            summary += f", status: {row['status']}"
+        return summary + "."
+
+    # Pre-aggregated single row — KPIs are just the result columns
+    if set(kpis) == cols | {"row_count"}:
+        parts = [f"{col.replace('_', ' ').capitalize()}: {_fmt(kpis[col])}" for col in df.columns]
+        return "; ".join(parts) + "."
+
+    return None
@@ -3,36 +3,53 @@ Schema search using TF-IDF + cosine similarity.
 Same interface as Milvus version — drop-in replacement.
 Swap to Milvus when Python 3.13 support lands.
 """
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from functools import lru_cache
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
 import numpy as np
 
+# Below this many tables search() sorts every score; above it, it selects the top k in O(N)
+PARTITION_MIN_TABLES = 1024
+
 
 class SchemaStore:
     def __init__(self, **kwargs):
         """kwargs accepted for Milvus compatibility — ignored here."""
-        self.vectorizer = TfidfVectorizer()
+        # Stateless hashing (no vocabulary dict) + bigrams for "product name" / "order id" style phrases
+        self.hasher = HashingVectorizer(n_features=2**18, ngram_range=(1, 2), alternate_sign=False)
+        self.tfidf = TfidfTransformer()
         self.table_names = []
         self.descriptions = []
         self.vectors = None
         self._ready = False
+        self._score = lru_cache(maxsize=512)(self._score_impl)
 
     def ingest(self, schema: dict):
         """Embed all table descriptions using TF-IDF."""
         self.table_names = list(schema.keys())
         self.descriptions = [schema[t]["description"] for t in self.table_names]
-        self.vectors = self.vectorizer.fit_transform(self.descriptions)
+        self.vectors = self.tfidf.fit_transform(self.hasher.transform(self.descriptions))
+        # New IDF weights — drop scores computed against the old ones
+        self._score = lru_cache(maxsize=512)(self._score_impl)
         self._ready = True
         print(f"[SchemaStore] Ingested {len(self.table_names)} tables (TF-IDF)")
 
+    def __getstate__(self):
+        # The memoized scorer is a per-instance wrapper — rebuild it instead of pickling it
+        state = self.__dict__.copy()
+        del state["_score"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._score = lru_cache(maxsize=512)(self._score_impl)
+
     def search(self, query: str, top_k: int = 3) -> list:
         """Find the most relevant tables for a user query."""
         if not self._ready:
             raise RuntimeError("SchemaStore not initialized. Call ingest() first.")
 
-        query_vec = self.vectorizer.transform([query])
-        scores = cosine_similarity(query_vec, self.vectors).flatten()
-        top_indices = np.argsort(scores)[::-1][:top_k]
+        scores = self._score(query)
+        top_indices = self._top_k(scores, top_k)
 
         matched = []
         for i in top_indices:
@@ -42,6 +59,36 @@ class SchemaStore:
             })
         return matched
 
+    @staticmethod
+    def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+        """
+        Indices of the top_k scores, best first, in the same order as np.argsort(scores)[::-1]
+        — tie order decides which tables fill the prompt when scores are equal (e.g. all zero).
+        """
+        n = len(scores)
+        if n < PARTITION_MIN_TABLES:
+            # A full sort of a few hundred scores is microseconds — and it is the only
+            # way to reproduce argsort's own tie order exactly
+            return np.argsort(scores)[::-1][:top_k]
+        # Large stores: partial selection (O(N)) finds the k-th best score. Every candidate
+        # tied with it is kept, then a stable sort over the reversed array breaks ties
+        # towards the higher index, like the reversed argsort above.
+        top_k = min(top_k, n)
+        neg_rev = -scores[::-1]
+        kth = np.partition(neg_rev, top_k - 1)[top_k - 1]
+        candidates = np.flatnonzero(neg_rev <= kth)
+        order = candidates[np.argsort(neg_rev[candidates], kind="stable")[:top_k]]
+        return n - 1 - order
+
+    def _score_impl(self, query: str) -> np.ndarray:
+        """Cosine similarity of the query against every table description (memoized via _score)."""
+        # TfidfTransformer L2-normalizes rows, so a sparse dot product is the cosine similarity
+        query_vec = self.tfidf.transform(self.hasher.transform([query]))
+        scores = (query_vec @ self.vectors.T).toarray().ravel()
+        # Shared between cache hits — keep callers from mutating it
+        scores.flags.writeable = False
+        return scores
+
     def get_matched_table_names(self, query: str, top_k: int = 3) -> list:
         """Convenience method — returns just table name strings."""
         results = self.search(query, top_k)
@@ -1,50 +1,90 @@
 """
 Reads SQLite database schema — table names, columns, types,
 foreign keys, and sample values. Outputs a dict per table.
+Sample rows feed the search descriptions but aren't kept in the schema;
+prompt context fetches one on demand.
 """
+import os
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from pathlib import Path
+
+# Schemas with at least this many tables count rows/fetch samples on a thread pool
+PARALLEL_MIN_TABLES = 16
+
+# SQLite's default limit on terms in one compound SELECT (SQLITE_MAX_COMPOUND_SELECT)
+_MAX_COMPOUND_TERMS = 500
+
+# get_schema_context results, keyed on (id(schema), table_names).
+# The schema object is stored alongside so a recycled id() can't return a stale string.
+_CONTEXT_CACHE = {}
+_CONTEXT_CACHE_SIZE = 1024
 
 
 def extract_schema(db_path: str) -> dict:
-    """Extract full schema info from SQLite database."""
-    conn = sqlite3.connect(db_path)
+    """
+    Extract full schema info from SQLite database.
+    Memoized until the database file changes — treat the returned dict as read-only.
+    """
+    db_path = os.path.abspath(db_path)
+    return _extract_schema_cached(db_path, os.path.getmtime(db_path))
+
+
+@lru_cache(maxsize=8)
+def _extract_schema_cached(db_path: str, mtime: float) -> dict:
+    conn = sqlite3.connect(_ro_uri(db_path), uri=True)
     cur = conn.cursor()
 
     # Get all table names
     cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
     tables = [row[0] for row in cur.fetchall()]
 
+    # Column info and foreign keys for every table in one pass each,
+    # via the pragma table-valued functions
+    columns_by_table = {t: [] for t in tables}
+    cur.execute(
+        "SELECT m.name, p.name, p.type, p.\"notnull\", p.pk "
+        "FROM sqlite_master m JOIN pragma_table_info(m.name) p "
+        "WHERE m.type='table' ORDER BY m.rowid, p.cid"
+    )
+    for table, name, col_type, notnull, pk in cur.fetchall():
+        columns_by_table[table].append({
+            "name": name,
+            "type": col_type,
+            "notnull": bool(notnull),
+            "primary_key": bool(pk),
+        })
+
+    fks_by_table = {t: [] for t in tables}
+    cur.execute(
+        "SELECT m.name, f.\"from\", f.\"table\", f.\"to\" "
+        "FROM sqlite_master m JOIN pragma_foreign_key_list(m.name) f "
+        "WHERE m.type='table' ORDER BY m.rowid, f.id, f.seq"
+    )
+    for table, from_col, to_table, to_col in cur.fetchall():
+        fks_by_table[table].append({
+            "from_column": from_col,
+            "to_table": to_table,
+            "to_column": to_col,
+        })
+
+    if len(tables) >= PARALLEL_MIN_TABLES:
+        # Row counts and samples scan table data — spread them over read-only worker connections
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            table_data = dict(zip(tables, pool.map(partial(_extract_one, db_path=db_path), tables)))
+    else:
+        row_counts = _count_rows(cur, tables)
+        table_data = {t: (row_counts[t], _fetch_samples(cur, t)) for t in tables}
+
+    conn.close()
+
     schema = {}
 
     for table in tables:
-        # Column info
-        cur.execute(f"PRAGMA table_info({table})")
-        columns = []
-        for col in cur.fetchall():
-            columns.append({
-                "name": col[1],
-                "type": col[2],
-                "notnull": bool(col[3]),
-                "primary_key": bool(col[5]),
-            })
-
-        # Foreign keys
-        cur.execute(f"PRAGMA foreign_key_list({table})")
-        foreign_keys = []
-        for fk in cur.fetchall():
-            foreign_keys.append({
-                "from_column": fk[3],
-                "to_table": fk[2],
-                "to_column": fk[4],
-            })
-
-        # Row count
-        cur.execute(f"SELECT COUNT(*) FROM {table}")
-        row_count = cur.fetchone()[0]
-
-        # Sample values (first 3 rows)
-        cur.execute(f"SELECT * FROM {table} LIMIT 3")
-        sample_rows = cur.fetchall()
+        columns = columns_by_table[table]
+        foreign_keys = fks_by_table[table]
+        row_count, sample_rows = table_data[table]
         col_names = [c["name"] for c in columns]
 
         # Build text description for search matching
@@ -56,14 +96,63 @@ def extract_schema(db_path: str) -> dict:
             "foreign_keys": foreign_keys,
             "row_count": row_count,
             "column_names": col_names,
-            "sample_rows": sample_rows,
             "description": description,
         }
 
-    conn.close()
     return schema
 
 
+def _count_rows(cur: sqlite3.Cursor, tables: list) -> dict:
+    """
+    Row count per table, batched into UNION ALL statements of at most
+    _MAX_COMPOUND_TERMS tables each (SQLite rejects longer compound SELECTs).
+    """
+    row_counts = {}
+    for start in range(0, len(tables), _MAX_COMPOUND_TERMS):
+        batch = tables[start:start + _MAX_COMPOUND_TERMS]
+        cur.execute(" UNION ALL ".join(f"SELECT ?, COUNT(*) FROM {_quote(t)}" for t in batch), batch)
+        row_counts.update(cur.fetchall())
+    return row_counts
+
+
+def _extract_one(table: str, db_path: str) -> tuple:
+    """(row_count, sample_rows) for one table, on its own read-only connection."""
+    conn = sqlite3.connect(_ro_uri(db_path), uri=True)
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT COUNT(*) FROM {_quote(table)}")
+        row_count = cur.fetchone()[0]
+        return row_count, _fetch_samples(cur, table)
+    finally:
+        conn.close()
+
+
+def _fetch_samples(cur: sqlite3.Cursor, table: str) -> list:
+    """Sample values — only used to enrich the search description, not stored."""
+    cur.execute(f"SELECT * FROM {_quote(table)} LIMIT 2")
+    return cur.fetchall()
+
+
+@lru_cache(maxsize=256)
+def _sample_row(db_path: str, mtime: float, table: str):
+    """First row of a table, or None if empty. Cached until the database file changes."""
+    conn = sqlite3.connect(_ro_uri(db_path), uri=True)
+    try:
+        return conn.execute(f"SELECT * FROM {_quote(table)} LIMIT 1").fetchone()
+    finally:
+        conn.close()
+
+
+def _ro_uri(db_path: str) -> str:
+    """Read-only SQLite URI. as_uri() percent-encodes the path, so '?', '#' or '%' in it are safe."""
+    return Path(db_path).resolve().as_uri() + "?mode=ro"
+
+
+def _quote(identifier: str) -> str:
+    """Quote a table name for interpolation into SQL."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
 def _build_description(table, columns, foreign_keys, col_names, sample_rows) -> str:
     """Build a rich text description of a table for search matching."""
     parts = [f"Table: {table}"]
@@ -82,16 +171,33 @@ def _build_description(table, columns, foreign_keys, col_names, sample_rows) ->
 
     # Sample values
     if sample_rows:
-        for row in sample_rows[:2]:
+        for row in sample_rows:
             row_str = " | ".join(str(v) for v in row)
             parts.append(f"Sample: {row_str}")
 
     return " . ".join(parts)
 
 
-def get_schema_context(schema: dict, table_names: list) -> str:
-    """Build a prompt-ready schema string for specific tables."""
+def get_schema_context(schema: dict, table_names: list, db_path: str = None) -> str:
+    """
+    Build a prompt-ready schema string for specific tables.
+    If db_path is given, each table also gets one sample row, fetched lazily from the database.
+    """
+    key = (id(schema), tuple(table_names), db_path)
+    cached = _CONTEXT_CACHE.get(key)
+    if cached is not None and cached[0] is schema:
+        return cached[1]
+
+    context = _build_schema_context(schema, table_names, db_path)
+    if len(_CONTEXT_CACHE) >= _CONTEXT_CACHE_SIZE:
+        _CONTEXT_CACHE.clear()
+    _CONTEXT_CACHE[key] = (schema, context)
+    return context
+
+
+def _build_schema_context(schema: dict, table_names: list, db_path: str = None) -> str:
     context_parts = []
+    mtime = os.path.getmtime(db_path) if db_path else None
 
     for table_name in table_names:
         if table_name not in schema:
@@ -106,8 +212,9 @@ def get_schema_context(schema: dict, table_names: list) -> str:
         for fk in info["foreign_keys"]:
             lines.append(f"  FK: {fk['from_column']} -> {fk['to_table']}.{fk['to_column']}")
 
-        if info["sample_rows"]:
-            lines.append(f"  Sample row: {dict(zip(info['column_names'], info['sample_rows'][0]))}")
+        sample_row = _sample_row(db_path, mtime, table_name) if db_path else None
+        if sample_row:
+            lines.append(f"  Sample row: {dict(zip(info['column_names'], sample_row))}")
 
         context_parts.append("\n".join(lines))
 
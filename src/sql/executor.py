@@ -1,15 +1,90 @@
 """
-Executes validated SQL against the database via SQLAlchemy.
+Executes validated SQL against the SQLite database via sqlite3.
 Returns a Pandas DataFrame or an error dict.
+Results are cached per SQL string until the database file changes.
 """
+import logging
+import os
 import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import quote
 import pandas as pd
-from sqlalchemy import create_engine, text
+
+# Optional: connectorx reads straight into Arrow buffers, skipping per-cell Python objects
+try:
+    import connectorx as cx
+except ImportError:
+    cx = None
+
+logger = logging.getLogger(__name__)
+
+# connectorx errors meaning "can't convert this result to Arrow" (mixed-type or all-NULL
+# columns) rather than "bad SQL" — sqlite3 can still read these results
+_CX_TYPE_ERRORS = re.compile(r"Invalid column type|Cannot infer type|Cannot convert|Unsupported", re.IGNORECASE)
+
+# Operations a read-only query is made of — the connection refuses to prepare anything else
+_READ_ONLY_ACTIONS = frozenset({
+    sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE,
+})
+
+
+def _read_only_authorizer(action, *args):
+    return sqlite3.SQLITE_OK if action in _READ_ONLY_ACTIONS else sqlite3.SQLITE_DENY
+
+
+# Substrings at least one _COLUMN_FIXES pattern requires (matched case-insensitively)
+_TRIGGERS = (".name", ".first_name", ".last_name", ".staff_name", ".employee_id", ".emp_id", ".description")
 
 
 class SQLExecutor:
+    CACHE_SIZE = 512
+
+    # Compiled once — these run on every execute()
+    _RE_CAST = re.compile(r'::(\w+)')
+    _RE_EXTRACT_YEAR = re.compile(r'EXTRACT\s*\(\s*YEAR\s+FROM\s+(\w+)\s*\)', re.IGNORECASE)
+    _RE_EXTRACT_MONTH = re.compile(r'EXTRACT\s*\(\s*MONTH\s+FROM\s+(\w+)\s*\)', re.IGNORECASE)
+    _RE_NOW = re.compile(r'\bNOW\(\)', re.IGNORECASE)
+    _RE_CURRENT_TIMESTAMP = re.compile(r'\bCURRENT_TIMESTAMP\b', re.IGNORECASE)
+    _RE_ILIKE = re.compile(r'\bILIKE\b', re.IGNORECASE)
+    _RE_INTERVAL = re.compile(r"INTERVAL\s+'(\d+)\s+days?'", re.IGNORECASE)
+    _RE_BOOL = re.compile(r'\bBOOL(?:EAN)?\b', re.IGNORECASE)
+
+    # Any compat fix needs one of these (upper-cased) — skip the regex pass otherwise
+    _COMPAT_TOKENS = ("EXTRACT", "NOW(", "CURRENT_TIMESTAMP", "ILIKE", "INTERVAL", "BOOL")
+
+    # products table: name -> product_name
+    # Match p.name, products.name but NOT staff.name or s.name
+    # Only fix when clearly referencing products table
+    _COLUMN_FIXES = tuple(
+        (re.compile(pattern, re.IGNORECASE), replacement)
+        for pattern, replacement in (
+            # products.description or p.description -> product_name (when alias is products/p joined to products)
+            (r'\bproducts\.name\b', 'products.product_name'),
+            (r'\bproducts\.description\b', 'products.product_name'),
+            # staff first_name/last_name -> name
+            (r'\.first_name\b', '.name'),
+            (r'\.last_name\b', '.name'),
+            (r'\.staff_name\b', '.name'),
+            # employee_id -> staff_id
+            (r'\.employee_id\b', '.staff_id'),
+            (r'\.emp_id\b', '.staff_id'),
+            # recipe description -> recipe_name
+            (r'\brecipes\.description\b', 'recipes.recipe_name'),
+            (r'\brecipes\.name\b', 'recipes.recipe_name'),
+        )
+    )
+
     def __init__(self, db_path: str):
-        self.engine = create_engine(f"sqlite:///{db_path}")
+        self.db_path = db_path
+        # One long-lived read-only connection, opened on first use and shared across threads
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_mtime = None
+        self._cache_lock = threading.Lock()
 
     def execute(self, sql: str) -> dict:
         """
@@ -17,11 +92,21 @@ class SQLExecutor:
         Returns: {"success": bool, "data": DataFrame or None, "error": str or None, "row_count": int}
         """
         try:
-            # Auto-fix common PostgreSQL syntax that LLMs generate
-            sql = self._fix_sqlite_compat(sql)
+            key = " ".join(sql.split())
+            df = self._cache_get(key)
+
+            if df is None:
+                # Auto-fix common PostgreSQL syntax that LLMs generate
+                fixed_sql = self._fix_sqlite_compat(sql)
+
+                df = self._read_sql(fixed_sql)
+                # Downstream KPI/chart code matches on lowercase column names
+                df.columns = df.columns.str.lower()
+                self._cache_put(key, df)
 
-            with self.engine.connect() as conn:
-                df = pd.read_sql_query(text(sql), conn)
+            # Callers (and LLM chart code) may write in place. Without Copy-on-Write a shallow
+            # copy shares column buffers with the cache entry — hand out a deep copy
+            df = df.copy()
 
             return {
                 "success": True,
@@ -38,38 +123,85 @@ class SQLExecutor:
                 "row_count": 0,
             }
 
+    def _read_sql(self, sql: str) -> pd.DataFrame:
+        """Run a query into a DataFrame — via Arrow when connectorx is installed."""
+        with self._conn_lock:
+            conn = self._connection()
+            if cx is None:
+                return pd.read_sql_query(sql, conn)
+            # connectorx opens its own connection: it can't open SQLite read-only and ignores
+            # PRAGMAs. Prepare the query on the read-only connection first — EXPLAIN compiles
+            # without running it, so SQL errors raise here and the authorizer refuses writes.
+            conn.execute(f"EXPLAIN {sql}")
+
+        try:
+            table = cx.read_sql(f"sqlite://{quote(os.path.abspath(self.db_path))}", sql, return_type="arrow")
+        except RuntimeError as e:
+            if not _CX_TYPE_ERRORS.search(str(e)):
+                raise
+            logger.warning("connectorx can't convert this result (%s) — reading it via sqlite3", e)
+        else:
+            return table.to_pandas(split_blocks=True, self_destruct=True)
+
+        with self._conn_lock:
+            return pd.read_sql_query(sql, self._connection())
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the read-only connection on first use. Caller holds _conn_lock."""
+        if self._conn is None:
+            # as_uri() percent-encodes the path, so '?', '#' or '%' in it can't break the URI
+            uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            # 64 MB page cache and in-memory temp B-trees (sorts, GROUP BY) — repeated
+            # aggregations stay memory-resident for the life of the connection
+            self._conn.execute("PRAGMA cache_size = -65536")
+            self._conn.execute("PRAGMA temp_store = MEMORY")
+            # Belt and braces on top of mode=ro: only reads may even be prepared
+            self._conn.set_authorizer(_read_only_authorizer)
+        return self._conn
+
+    def _cache_get(self, key: str):
+        """Return the cached DataFrame for this SQL, dropping the cache if the DB changed."""
+        mtime = os.path.getmtime(self.db_path)
+        with self._cache_lock:
+            if mtime != self._cache_mtime:
+                self._cache.clear()
+                self._cache_mtime = mtime
+                return None
+            df = self._cache.get(key)
+            if df is not None:
+                self._cache.move_to_end(key)
+            return df
+
+    def _cache_put(self, key: str, df: pd.DataFrame):
+        with self._cache_lock:
+            self._cache[key] = df
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+
     def _fix_sqlite_compat(self, sql: str) -> str:
         """Fix common PostgreSQL/MySQL syntax to SQLite equivalents."""
-        # Fix ::DATE, ::TEXT, ::INTEGER etc.
-        sql = re.sub(r'::(\w+)', r'', sql)
-
-        # Fix EXTRACT(YEAR FROM col) -> strftime('%Y', col)
-        sql = re.sub(
-            r'EXTRACT\s*\(\s*YEAR\s+FROM\s+(\w+)\s*\)',
-            r"CAST(strftime('%Y', \1) AS INTEGER)",
-            sql, flags=re.IGNORECASE
-        )
-        sql = re.sub(
-            r'EXTRACT\s*\(\s*MONTH\s+FROM\s+(\w+)\s*\)',
-            r"CAST(strftime('%m', \1) AS INTEGER)",
-            sql, flags=re.IGNORECASE
-        )
+        upper_sql = sql.upper()
+        if "::" in sql or any(token in upper_sql for token in self._COMPAT_TOKENS):
+            # Fix ::DATE, ::TEXT, ::INTEGER etc.
+            sql = self._RE_CAST.sub('', sql)
 
-        # Fix NOW() -> datetime('now')
-        sql = re.sub(r'\bNOW\(\)', "datetime('now')", sql, flags=re.IGNORECASE)
+            # Fix EXTRACT(YEAR FROM col) -> strftime('%Y', col)
+            sql = self._RE_EXTRACT_YEAR.sub(r"CAST(strftime('%Y', \1) AS INTEGER)", sql)
+            sql = self._RE_EXTRACT_MONTH.sub(r"CAST(strftime('%m', \1) AS INTEGER)", sql)
 
-        # Fix CURRENT_TIMESTAMP -> datetime('now')
-        sql = re.sub(r'\bCURRENT_TIMESTAMP\b', "datetime('now')", sql, flags=re.IGNORECASE)
+            # Fix NOW() / CURRENT_TIMESTAMP -> datetime('now')
+            sql = self._RE_NOW.sub("datetime('now')", sql)
+            sql = self._RE_CURRENT_TIMESTAMP.sub("datetime('now')", sql)
 
-        # Fix ILIKE -> LIKE
-        sql = re.sub(r'\bILIKE\b', 'LIKE', sql, flags=re.IGNORECASE)
+            # Fix ILIKE -> LIKE
+            sql = self._RE_ILIKE.sub('LIKE', sql)
 
-        # Fix INTERVAL '10 days' -> nothing
-        sql = re.sub(r"INTERVAL\s+'(\d+)\s+days?'", r"'\1 days'", sql, flags=re.IGNORECASE)
+            # Fix INTERVAL '10 days' -> nothing
+            sql = self._RE_INTERVAL.sub(r"'\1 days'", sql)
 
-        # Fix BOOL/BOOLEAN -> INTEGER
-        sql = re.sub(r'\bBOOLEAN\b', 'INTEGER', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'\bBOOL\b', 'INTEGER', sql, flags=re.IGNORECASE)
+            # Fix BOOL/BOOLEAN -> INTEGER
+            sql = self._RE_BOOL.sub('INTEGER', sql)
 
         # Fix common hallucinated column names
         sql = self._fix_column_names(sql)
@@ -78,35 +210,21 @@ class SQLExecutor:
 
     def _fix_column_names(self, sql: str) -> str:
         """Fix commonly hallucinated column names."""
-        # products table: name -> product_name
-        # Match p.name, products.name but NOT staff.name or s.name
-        # Only fix when clearly referencing products table
-        replacements = [
-            # products.description or p.description -> product_name (when alias is products/p joined to products)
-            (r'\bproducts\.name\b', 'products.product_name'),
-            (r'\bproducts\.description\b', 'products.product_name'),
-            # staff first_name/last_name -> name
-            (r'\.first_name\b', '.name'),
-            (r'\.last_name\b', '.name'),
-            (r'\.staff_name\b', '.name'),
-            # employee_id -> staff_id
-            (r'\.employee_id\b', '.staff_id'),
-            (r'\.emp_id\b', '.staff_id'),
-            # recipe description -> recipe_name
-            (r'\brecipes\.description\b', 'recipes.recipe_name'),
-            (r'\brecipes\.name\b', 'recipes.recipe_name'),
-        ]
+        # Every pattern needs one of these — skip the regex passes on well-formed SQL
+        lowered = sql.lower()
+        if not any(trigger in lowered for trigger in _TRIGGERS):
+            return sql
 
-        for pattern, replacement in replacements:
-            sql = re.sub(pattern, replacement, sql, flags=re.IGNORECASE)
+        for pattern, replacement in self._COLUMN_FIXES:
+            sql = pattern.sub(replacement, sql)
 
         return sql
 
     def test_connection(self) -> bool:
         """Verify database is accessible."""
         try:
-            with self.engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
+            with self._conn_lock:
+                self._connection().execute("SELECT 1")
             return True
         except Exception:
             return False
\ No newline at end of file
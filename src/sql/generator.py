@@ -1,3 +1,5 @@
+import re
+
 SQL_SYSTEM_PROMPT = """You are a SQL expert for a manufacturing SQLite database.
 Generate a single SQLite-compatible SELECT query to answer the user's question.
 
@@ -32,6 +34,9 @@ ALIAS RULES:
 - Double-check every column reference matches its table alias
 """
 
+_FENCE_RE = re.compile(r"```[a-zA-Z]*\n?(.*?)\n?```", re.DOTALL)
+_SQL_EXTRACT = re.compile(r"^[ \t]*(?:SELECT|WITH)\b.*", re.IGNORECASE | re.MULTILINE | re.DOTALL)
+
 
 def build_sql_prompt(query: str, schema_context: str, error_context: str = None) -> str:
     """Build the prompt for SQL generation."""
@@ -55,30 +60,17 @@ def parse_sql_response(response: str) -> str:
     """Clean LLM response to extract just the SQL."""
     sql = response.strip()
 
-    # Remove markdown code fences
-    if "```" in sql:
-        lines = sql.split("\n")
-        cleaned = []
-        inside_fence = False
-        for line in lines:
-            if line.strip().startswith("```"):
-                inside_fence = not inside_fence
-                continue
-            if inside_fence or not any(line.strip().startswith(x) for x in ["Here", "This", "The", "I "]):
-                cleaned.append(line)
-        sql = "\n".join(cleaned).strip()
-
-    # Remove leading explanation lines
-    lines = sql.split("\n")
-    sql_start = 0
-    for i, line in enumerate(lines):
-        upper = line.strip().upper()
-        if upper.startswith(("SELECT", "WITH")):
-            sql_start = i
-            break
-    sql = "\n".join(lines[sql_start:]).strip()
+    # Keep only the contents of a markdown code fence, if there is one
+    fence = _FENCE_RE.search(sql)
+    if fence:
+        sql = fence.group(1)
+
+    # Drop leading explanation lines — the query starts at the first SELECT/WITH line
+    match = _SQL_EXTRACT.search(sql)
+    if match:
+        sql = match.group(0)
 
     # Remove trailing semicolons
-    sql = sql.rstrip(";").strip()
+    sql = sql.strip().rstrip(";").strip()
 
-    return sql
\ No newline at end of file
+    return sql
@@ -1,8 +1,16 @@
 """
 Safety check — ensures generated SQL is read-only.
 Rejects any write/modify operations before execution.
+SQL is checked on its sqlglot AST; the keyword scan is the fallback for SQL sqlglot can't parse.
 """
+import logging
 import re
+import threading
+from contextlib import contextmanager
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
 
 FORBIDDEN_KEYWORDS = [
     "INSERT", "UPDATE", "DELETE", "DROP", "TRUNCATE",
@@ -10,10 +18,56 @@ FORBIDDEN_KEYWORDS = [
     "EXEC", "EXECUTE", "MERGE",
 ]
 
+# One case-insensitive alternation — a single scan instead of one regex per keyword
+_FORBIDDEN_RE = re.compile(r"\b(?:" + "|".join(FORBIDDEN_KEYWORDS) + r")\b", re.IGNORECASE)
+
+# Statement roots a read-only query may have
+_READ_ROOTS = (exp.Select, exp.Union, exp.Intersect, exp.Except)
+
+# AST nodes that write, change schema/permissions, or are statements sqlglot only kept as raw text.
+# Looked up by name — some were renamed across sqlglot versions (e.g. AlterTable -> Alter).
+_WRITE_NODES = tuple(
+    getattr(exp, name) for name in (
+        "Insert", "Update", "Delete", "Drop", "Create", "Alter", "AlterTable",
+        "TruncateTable", "Merge", "Grant", "Revoke", "Command", "Attach", "Detach", "Pragma",
+    ) if hasattr(exp, name)
+)
+
+
+# sqlglot warns about every statement it can only keep as a raw Command. The validator rejects
+# those anyway, so the warning is dropped — only for parses made here, in the calling thread.
+_SQLGLOT_LOGGER = logging.getLogger("sqlglot")
+_validating = threading.local()
+_filter_lock = threading.Lock()
+_filter_users = 0
+
+
+def _drop_unsupported_syntax(record: logging.LogRecord) -> bool:
+    return not (getattr(_validating, "active", False) and "contains unsupported syntax" in record.getMessage())
+
+
+@contextmanager
+def _quiet_unsupported_syntax():
+    """Install the filter while any validation is parsing; it only affects this thread's records."""
+    global _filter_users
+    with _filter_lock:
+        if _filter_users == 0:
+            _SQLGLOT_LOGGER.addFilter(_drop_unsupported_syntax)
+        _filter_users += 1
+    _validating.active = True
+    try:
+        yield
+    finally:
+        _validating.active = False
+        with _filter_lock:
+            _filter_users -= 1
+            if _filter_users == 0:
+                _SQLGLOT_LOGGER.removeFilter(_drop_unsupported_syntax)
+
 
 def validate_sql(sql: str) -> dict:
     """
-    Check SQL for forbidden keywords.
+    Check SQL is a single read-only SELECT.
     Returns: {"valid": bool, "error": str or None, "cleaned_sql": str}
     """
     if not sql or not sql.strip():
@@ -30,21 +84,20 @@ def validate_sql(sql: str) -> dict:
     # Remove trailing semicolons (SQLite handles fine without)
     cleaned = cleaned.rstrip(";").strip()
 
-    # Check for forbidden keywords
-    # Use word boundary matching to avoid false positives
-    # e.g., "UPDATED_AT" column name shouldn't trigger "UPDATE"
-    upper_sql = cleaned.upper()
-    for keyword in FORBIDDEN_KEYWORDS:
-        pattern = r'\b' + keyword + r'\b'
-        if re.search(pattern, upper_sql):
-            return {
-                "valid": False,
-                "error": f"Forbidden keyword detected: {keyword}. Only SELECT queries allowed.",
-                "cleaned_sql": "",
-            }
+    # Check the parsed statement; fall back to a keyword scan if sqlglot can't parse it
+    try:
+        with _quiet_unsupported_syntax():
+            statements = sqlglot.parse(cleaned, read="sqlite")
+    except SqlglotError:
+        error = _check_keywords(cleaned)
+    else:
+        error = _check_ast(statements)
+
+    if error:
+        return {"valid": False, "error": error, "cleaned_sql": ""}
 
     # Must start with SELECT or WITH (for CTEs)
-    first_word = upper_sql.lstrip().split()[0] if upper_sql.strip() else ""
+    first_word = cleaned.split(None, 1)[0].upper() if cleaned else ""
     if first_word not in ("SELECT", "WITH"):
         return {
             "valid": False,
@@ -52,4 +105,30 @@ def validate_sql(sql: str) -> dict:
             "cleaned_sql": "",
         }
 
-    return {"valid": True, "error": None, "cleaned_sql": cleaned}
\ No newline at end of file
+    return {"valid": True, "error": None, "cleaned_sql": cleaned}
+
+
+def _check_ast(statements: list):
+    """Return an error message if the parsed SQL is anything but a single read-only query."""
+    # A trailing "; -- comment" parses as an extra Semicolon statement — sqlite3 ignores it, so do we
+    statements = [st for st in statements if st is not None and not isinstance(st, exp.Semicolon)]
+    if len(statements) != 1:
+        return "Only a single SELECT query is allowed."
+
+    tree = statements[0]
+    for node in tree.walk():
+        if isinstance(node, _WRITE_NODES):
+            name = node.this if isinstance(node, exp.Command) else node.key
+            return f"Forbidden keyword detected: {str(name).upper()}. Only SELECT queries allowed."
+
+    if not isinstance(tree, _READ_ROOTS):
+        return f"Query must be a SELECT. Got: {tree.key.upper()}"
+    return None
+
+
+def _check_keywords(sql: str):
+    """Word-boundary keyword scan — e.g. "UPDATED_AT" doesn't trigger "UPDATE"."""
+    match = _FORBIDDEN_RE.search(sql)
+    if match:
+        return f"Forbidden keyword detected: {match.group(0).upper()}. Only SELECT queries allowed."
+    return None
@@ -0,0 +1,10 @@
+"""
+pytest setup for the unit tests.
+test_all_queries.py is the end-to-end script (it needs a running LLM) — run it directly, not via pytest.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+collect_ignore = ["test_all_queries.py"]
@@ -0,0 +1,48 @@
+"""
+Agent behaviour with a stubbed LLM backend (the real PromptCache stays in the loop).
+"""
+import json
+import os
+
+import pytest
+
+from src.agents.analytics_agent import AnalyticsAgent
+from src.sql.generator import SQL_SYSTEM_PROMPT
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sample_manufacturing.db")
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = AnalyticsAgent(DB_PATH)
+    agent.llm.cache.clear()
+    sql_answers = []
+
+    def fake_ollama(prompt, system_prompt, stop_on=None, format=None):
+        if system_prompt == SQL_SYSTEM_PROMPT:
+            return sql_answers.pop(0) if len(sql_answers) > 1 else sql_answers[0]
+        if format is not None:
+            return json.dumps({"intent": "AGGREGATION", "needs_chart": False})
+        return "Summary."
+
+    monkeypatch.setattr(agent.llm, "_ollama_generate", fake_ollama)
+    agent.sql_answers = sql_answers
+    yield agent
+    agent.llm.cache.clear()
+
+
+def test_failed_sql_is_not_replayed_from_the_prompt_cache(agent):
+    question = "What products did we make on 2026-02-14?"
+    agent.sql_answers[:] = ["SELECT no_such_column FROM products"]
+    report = agent.ask(question)
+    assert report["error"]
+    assert report["row_count"] == 0
+
+    agent.sql_answers[:] = ["SELECT product_name FROM products"]
+    report = agent.ask(question)
+    assert report["error"] is None
+    assert report["row_count"] > 0
+
+
+def test_agents_share_one_report_pool():
+    assert AnalyticsAgent(DB_PATH)._pool is AnalyticsAgent(DB_PATH)._pool
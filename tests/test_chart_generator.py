@@ -0,0 +1,29 @@
+"""
+Chart generation must never write into the caller's DataFrame.
+"""
+import pandas as pd
+
+from src.report.chart_generator import auto_chart, execute_chart_code
+
+
+def _orders():
+    return pd.DataFrame({
+        "Line_ID": ["LINE-1", "LINE-2", "LINE-3"],
+        "status": ["done", "active", "active"],
+        "quantity_actual": [90.0, 80.0, 70.0],
+    })
+
+
+def test_chart_code_writing_in_place_leaves_input_untouched():
+    df = _orders()
+    code = "df.loc[0, 'status'] = -1\ndf['quantity_actual'] *= 0\nfig = go.Figure()"
+    result = execute_chart_code(code, df, {})
+    assert result["success"], result["error"]
+    pd.testing.assert_frame_equal(df, _orders())
+
+
+def test_auto_chart_leaves_input_untouched():
+    df = _orders()
+    for intent in ("COMPARISON", "REPORT", "AGGREGATION"):
+        auto_chart(df, {}, intent, "compare lines")
+    pd.testing.assert_frame_equal(df, _orders())
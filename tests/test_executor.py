@@ -0,0 +1,72 @@
+"""
+Tests for SQLExecutor result caching.
+"""
+import logging
+import os
+import sqlite3
+
+import pytest
+
+import src.sql.executor as executor_module
+from src.sql.executor import SQLExecutor
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sample_manufacturing.db")
+
+
+def test_in_place_writes_do_not_corrupt_cached_results():
+    executor = SQLExecutor(DB_PATH)
+    sql = "SELECT product_id, standard_cost FROM products ORDER BY product_id"
+    first = executor.execute(sql)["data"]
+    expected = first.values.tolist()
+
+    first.loc[0, "standard_cost"] = -1
+    first.iloc[1, 0] = "corrupted"
+
+    assert executor.execute(sql)["data"].values.tolist() == expected
+
+
+def test_database_path_with_uri_special_characters(tmp_path):
+    db_dir = tmp_path / "odd?dir#name%20 x"
+    db_dir.mkdir()
+    db_path = db_dir / "test.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+    conn.commit()
+    conn.close()
+
+    executor = SQLExecutor(str(db_path))
+    assert executor.test_connection()
+    assert executor.execute("SELECT COUNT(*) AS n FROM t")["data"]["n"].tolist() == [2]
+
+
+needs_connectorx = pytest.mark.skipif(executor_module.cx is None, reason="connectorx not installed")
+
+
+@needs_connectorx
+def test_sql_errors_are_raised_once_not_retried(monkeypatch):
+    calls = []
+    monkeypatch.setattr(executor_module.cx, "read_sql", lambda *a, **kw: calls.append(a))
+    result = SQLExecutor(DB_PATH).execute("SELECT no_such_column FROM products")
+    assert not result["success"]
+    assert "no_such_column" in result["error"]
+    # Rejected while preparing on the read-only connection — connectorx never ran it
+    assert calls == []
+
+
+@needs_connectorx
+def test_connectorx_type_errors_fall_back_to_sqlite3(caplog):
+    sql = "SELECT x FROM (SELECT 1 AS x UNION ALL SELECT 'a')"
+    with caplog.at_level(logging.WARNING, logger="src.sql.executor"):
+        result = SQLExecutor(DB_PATH).execute(sql)
+    assert result["success"], result["error"]
+    assert result["data"]["x"].tolist() == [1, "a"]
+    assert "Invalid column type" in caplog.text
+
+
+def test_writes_are_refused(tmp_path):
+    db_path = tmp_path / "test.db"
+    sqlite3.connect(db_path).close()
+    result = SQLExecutor(str(db_path)).execute("CREATE TABLE t (x INTEGER)")
+    assert not result["success"]
+    assert sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM sqlite_master").fetchone() == (0,)
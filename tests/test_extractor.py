@@ -0,0 +1,48 @@
+"""
+Tests for schema extraction helpers.
+"""
+import sqlite3
+
+import pytest
+
+from src.schema.extractor import PARALLEL_MIN_TABLES, _MAX_COMPOUND_TERMS, _count_rows, _sample_row, extract_schema
+
+
+def _odd_path_db(tmp_path, n_tables: int = 1) -> str:
+    """A small database under a directory whose name has URI-special characters."""
+    db_dir = tmp_path / "odd?dir#name%20 x"
+    db_dir.mkdir()
+    db_path = str(db_dir / "test.db")
+    conn = sqlite3.connect(db_path)
+    for i in range(n_tables):
+        conn.execute(f"CREATE TABLE t{i} (x INTEGER, label TEXT)")
+        conn.execute(f"INSERT INTO t{i} VALUES (?, ?)", (i, f"row {i}"))
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def test_count_rows_batches_past_compound_select_limit():
+    conn = sqlite3.connect(":memory:")
+    tables = [f"t{i}" for i in range(_MAX_COMPOUND_TERMS + 100)]
+    for i, table in enumerate(tables):
+        conn.execute(f"CREATE TABLE {table} (x INTEGER)")
+        conn.executemany(f"INSERT INTO {table} VALUES (?)", [(j,) for j in range(i % 3)])
+
+    row_counts = _count_rows(conn.cursor(), tables)
+
+    assert row_counts == {table: i % 3 for i, table in enumerate(tables)}
+
+
+
+def test_sample_row_with_uri_special_characters_in_path(tmp_path):
+    db_path = _odd_path_db(tmp_path)
+    assert _sample_row(db_path, 0.0, "t0") == (0, "row 0")
+
+
+@pytest.mark.parametrize("n_tables", [1, PARALLEL_MIN_TABLES])
+def test_extract_schema_with_uri_special_characters_in_path(tmp_path, n_tables):
+    # Covers both the single-connection path and the thread-pool path
+    schema = extract_schema(_odd_path_db(tmp_path, n_tables))
+    assert len(schema) == n_tables
+    assert all(table["row_count"] == 1 for table in schema.values())
@@ -0,0 +1,53 @@
+"""
+The keyword fast path must agree with the LLM classifier's expected answers on the suite questions.
+"""
+import ast
+import os
+
+import pytest
+
+from src.agents.analytics_agent import AnalyticsAgent
+
+SUITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_all_queries.py")
+
+
+def _suite_questions() -> list:
+    """(expected_intent, question) pairs from the end-to-end suite, read without running it."""
+    with open(SUITE_PATH, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "TESTS" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise AssertionError("TESTS not found in test_all_queries.py")
+
+
+SUITE = _suite_questions()
+
+
+@pytest.mark.parametrize("expected_intent,question", SUITE)
+def test_fast_path_agrees_with_llm_intent(expected_intent, question):
+    result = AnalyticsAgent._fast_intent(question)
+    if result is None:
+        pytest.skip("ambiguous — left to the LLM")
+    assert result["intent"] == expected_intent
+
+
+@pytest.mark.parametrize("expected_intent,question", SUITE)
+def test_fast_path_never_disables_chart_fallback(expected_intent, question):
+    result = AnalyticsAgent._fast_intent(question)
+    if result is None:
+        pytest.skip("ambiguous — left to the LLM")
+    # The LLM classifier can turn the chart fallback on for any intent that gets charted,
+    # so the fast path must not turn it off (LOOKUP results are never charted)
+    if result["intent"] != "LOOKUP":
+        assert result["needs_chart"]
+
+
+def test_fast_path_aggregation_keeps_chart_fallback():
+    result = AnalyticsAgent._fast_intent("What is the average yield per line?")
+    assert result == {"intent": "AGGREGATION", "needs_chart": True}
+
+
+def test_fast_path_resolves_most_of_the_suite():
+    resolved = [q for _, q in SUITE if AnalyticsAgent._fast_intent(q) is not None]
+    assert len(resolved) >= len(SUITE) // 2
@@ -0,0 +1,42 @@
+"""
+Tests for PromptCache persistence batching.
+"""
+import os
+
+from src.llm.cache import PromptCache
+
+
+def test_puts_are_batched_until_save_every(tmp_path):
+    path = str(tmp_path / "cache.pkl")
+    cache = PromptCache(path=path, save_every=3)
+    cache.put("q1", "sys", "a1")
+    cache.put("q2", "sys", "a2")
+    assert not os.path.exists(path)
+
+    cache.put("q3", "sys", "a3")
+    assert os.path.exists(path)
+    assert PromptCache(path=path).get("q3", "sys") == "a3"
+
+
+def test_flush_writes_pending_entries(tmp_path):
+    path = str(tmp_path / "cache.pkl")
+    cache = PromptCache(path=path, save_every=100)
+    cache.put("q", "sys", "answer")
+    cache.flush()
+
+    reloaded = PromptCache(path=path)
+    assert reloaded.get("q", "sys") == "answer"
+
+
+def test_flush_skips_write_when_nothing_changed(tmp_path):
+    path = str(tmp_path / "cache.pkl")
+    cache = PromptCache(path=path, save_every=100)
+    cache.flush()
+    assert not os.path.exists(path)
+
+
+def test_in_memory_cache_flush_is_a_no_op():
+    cache = PromptCache(save_every=1)
+    cache.put("q", "sys", "answer")
+    cache.flush()
+    assert cache.get("q", "sys") == "answer"
@@ -0,0 +1,61 @@
+"""
+Regression tests for SchemaStore top-k ordering.
+Tie order decides which tables reach the SQL prompt, so it must match np.argsort(scores)[::-1].
+"""
+import os
+
+import numpy as np
+import pytest
+
+from src.retrieval.schema_store import PARTITION_MIN_TABLES, SchemaStore
+from src.schema.extractor import extract_schema
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sample_manufacturing.db")
+
+
+def _baseline(scores, top_k):
+    return list(np.argsort(scores)[::-1][:top_k])
+
+
+@pytest.mark.parametrize("scores", [
+    np.zeros(7),
+    np.array([0.1, 0.25, 0.1, 0.0, 0.0, 0.0, 0.0]),
+    np.array([0.36, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]),
+    np.array([0.5, 0.5, 0.5, 0.2, 0.2]),
+])
+@pytest.mark.parametrize("top_k", [1, 3, 4, 10])
+def test_top_k_matches_argsort_on_ties(scores, top_k):
+    assert list(SchemaStore._top_k(scores, top_k)) == _baseline(scores, top_k)
+
+
+def test_top_k_large_store_breaks_ties_by_higher_index():
+    scores = np.zeros(PARTITION_MIN_TABLES + 5)
+    scores[[3, 10, 20]] = [0.4, 0.9, 0.4]
+    n = len(scores)
+    assert list(SchemaStore._top_k(scores, 5)) == [10, 20, 3, n - 1, n - 2]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_top_k_large_store_matches_full_stable_sort(seed):
+    # Few distinct values, so ties straddle the k-th place
+    scores = np.random.default_rng(seed).integers(0, 4, PARTITION_MIN_TABLES + 500) / 4
+    n = len(scores)
+    reference = n - 1 - np.argsort(-scores[::-1], kind="stable")
+    for top_k in (1, 4, 50):
+        assert list(SchemaStore._top_k(scores, top_k)) == list(reference[:top_k])
+
+
+def test_top_k_large_store_clamps_top_k():
+    scores = np.zeros(PARTITION_MIN_TABLES + 5)
+    result = SchemaStore._top_k(scores, len(scores) + 10)
+    assert list(result) == list(range(len(scores) - 1, -1, -1))
+
+
+def test_all_zero_query_keeps_fact_tables():
+    store = SchemaStore()
+    store.ingest(extract_schema(DB_PATH))
+    question = "how many orders did we complete last week?"
+    assert not store._score(question).any()
+    assert store.get_matched_table_names(question, top_k=4) == [
+        "production_steps", "production_orders", "shift_logs", "staff",
+    ]
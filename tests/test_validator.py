@@ -0,0 +1,44 @@
+"""
+Tests for the read-only SQL validator.
+"""
+import logging
+
+import pytest
+import sqlglot
+
+from src.sql.validator import validate_sql
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1;\n-- returns one",
+    "SELECT * FROM products ; --",
+    "SELECT order_id FROM production_orders; -- completed orders only",
+])
+def test_trailing_comment_after_semicolon_is_allowed(sql):
+    result = validate_sql(sql)
+    assert result["valid"], result["error"]
+    assert result["cleaned_sql"].startswith("SELECT")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1; DROP TABLE products",
+    "SELECT 1; -- comment\nDELETE FROM products",
+    "SELECT 1; VACUUM",
+])
+def test_second_statement_is_rejected(sql):
+    assert not validate_sql(sql)["valid"]
+
+
+def test_unsupported_syntax_is_rejected_without_warning(caplog):
+    with caplog.at_level(logging.WARNING, logger="sqlglot"):
+        result = validate_sql("EXPLAIN QUERY PLAN SELECT 1")
+    assert not result["valid"]
+    assert not [r for r in caplog.records if r.name == "sqlglot"]
+
+
+def test_other_sqlglot_users_still_get_warnings(caplog):
+    validate_sql("EXPLAIN QUERY PLAN SELECT 1")
+    with caplog.at_level(logging.WARNING, logger="sqlglot"):
+        sqlglot.parse("EXPLAIN QUERY PLAN SELECT 1", read="sqlite")
+    assert any("unsupported syntax" in r.getMessage() for r in caplog.records)
+    assert not logging.getLogger("sqlglot").filters
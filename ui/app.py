@@ -7,6 +7,8 @@ import pandas as pd
 import sys
 import os
 import time
+from itertools import islice
+from uuid import uuid4
 
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -22,43 +24,15 @@ st.set_page_config(
 )
 
 # ---- Custom CSS ----
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2rem;
-        font-weight: 700;
-        margin-bottom: 0.5rem;
-    }
-    .sub-header {
-        font-size: 1rem;
-        opacity: 0.7;
-        margin-bottom: 2rem;
-    }
-    .kpi-card {
-        background: rgba(255,255,255,0.05);
-        border-radius: 12px;
-        padding: 1.2rem;
-        text-align: center;
-        border: 1px solid rgba(255,255,255,0.1);
-    }
-    .kpi-value {
-        font-size: 1.8rem;
-        font-weight: 700;
-    }
-    .kpi-label {
-        font-size: 0.85rem;
-        opacity: 0.6;
-        margin-top: 0.3rem;
-    }
-    .report-section {
-        background: rgba(255,255,255,0.05);
-        border-radius: 12px;
-        padding: 1.5rem;
-        margin: 1rem 0;
-        border: 1px solid rgba(255,255,255,0.1);
-    }
-</style>
-""", unsafe_allow_html=True)
+@st.cache_resource
+def load_css() -> str:
+    """Read ui/style.css once per process instead of rebuilding the block on every rerun."""
+    css_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")
+    with open(css_path, encoding="utf-8") as f:
+        return f"<style>\n{f.read()}</style>"
+
+
+st.markdown(load_css(), unsafe_allow_html=True)
 
 
 # ---- Initialize Agent (cached) ----
@@ -71,53 +45,107 @@ def load_agent():
     return AnalyticsAgent(db_path)
 
 
+class FailedReport(Exception):
+    """Raised out of cached_ask so st.cache_data doesn't keep a failed report."""
+
+    def __init__(self, report: dict):
+        super().__init__(report["error"])
+        self.report = report
+
+
+@st.cache_data(ttl=24 * 3600, show_spinner=False)
+def cached_ask(_agent: AnalyticsAgent, question: str, db_mtime: float) -> dict:
+    """
+    Reports are cached per question for a day — Streamlit reruns and repeated
+    sample questions skip the pipeline. db_mtime is part of the key so edits to the database invalidate it.
+    The LLM summary is left out (None) and streamed in by render_report.
+    Failed reports are raised, not returned — exceptions aren't cached, so asking again retries.
+    """
+    report = _agent.ask(question, stream_summary=True)
+    if report.get("error"):
+        raise FailedReport(report)
+    return report
+
+
+def ask(agent: AnalyticsAgent, question: str) -> dict:
+    try:
+        return cached_ask(agent, question, os.path.getmtime(agent.db_path))
+    except FailedReport as e:
+        return e.report
+
+
+# KPI cards in display priority order: (kpi key, label, suffix)
+KPI_CARDS = (
+    ("avg_yield", "Avg Yield", "%"),
+    ("total_orders", "Total Orders", ""),
+    ("total_planned", "Total Planned", ""),
+    ("total_actual", "Total Actual", ""),
+    ("total_variance", "Variance", ""),
+    ("avg_duration_min", "Avg Duration", " min"),
+    ("total_shifts", "Total Shifts", ""),
+    ("min_yield", "Min Yield", "%"),
+    ("max_yield", "Max Yield", "%"),
+    ("unique_supervisors", "Supervisors", ""),
+    ("row_count", "Records", ""),
+)
+MAX_KPI_CARDS = 4
+
+# Rows sent to the browser in the raw-data table
+MAX_TABLE_ROWS = 1000
+
+# Chat messages re-rendered on every rerun — older ones are archived and only drawn on request
+MAX_HISTORY = 20
+
+SAMPLE_QUESTIONS = (
+    "How many orders were completed?",
+    "What was the yield for LINE-3 this week?",
+    "Show me details for order PO-1042",
+    "Compare yield between day and night shift",
+    "Which supervisor had the best performance?",
+    "Plot yield trend for the last 10 days",
+    "What products did we make on 2026-02-14?",
+    "What's the average cycle time for ChemX-500?",
+)
+
+
 def render_kpis(kpis: dict):
     """Render KPI cards in columns."""
     if not kpis or "error" in kpis:
         return
 
     # Pick the most important KPIs to display as cards
-    display_kpis = {}
-
-    key_map = {
-        "avg_yield": ("Avg Yield", "%"),
-        "total_orders": ("Total Orders", ""),
-        "total_planned": ("Total Planned", ""),
-        "total_actual": ("Total Actual", ""),
-        "total_variance": ("Variance", ""),
-        "avg_duration_min": ("Avg Duration", " min"),
-        "total_shifts": ("Total Shifts", ""),
-        "min_yield": ("Min Yield", "%"),
-        "max_yield": ("Max Yield", "%"),
-        "unique_supervisors": ("Supervisors", ""),
-        "row_count": ("Records", ""),
-    }
-
-    for key, (label, suffix) in key_map.items():
-        if key in kpis:
-            display_kpis[label] = f"{kpis[key]}{suffix}"
+    # (ordered scan rather than a set intersection — priority order matters)
+    display_kpis = list(islice(
+        ((label, f"{kpis[key]}{suffix}") for key, label, suffix in KPI_CARDS if key in kpis),
+        MAX_KPI_CARDS,
+    ))
 
     if not display_kpis:
         return
 
-    cols = st.columns(min(len(display_kpis), 4))
-    for i, (label, value) in enumerate(list(display_kpis.items())[:4]):
-        with cols[i]:
-            st.markdown(f"""
-            <div class="kpi-card">
-                <div class="kpi-value">{value}</div>
-                <div class="kpi-label">{label}</div>
-            </div>
-            """, unsafe_allow_html=True)
+    cols = st.columns(len(display_kpis))
+    for col, (label, value) in zip(cols, display_kpis):
+        col.metric(label=label, value=value)
 
 
-def render_report(report: dict):
-    """Render the full report."""
+@st.fragment
+def render_report(report: dict, key: str):
+    """
+    Render the full report. key must be unique per chat message.
+    Each report is a fragment, so interacting with one reruns only that report.
+    """
 
     # Summary
     st.markdown("### 📋 Summary")
-    st.markdown(f'<div class="report-section">{report["summary"]}</div>',
-                unsafe_allow_html=True)
+    summary_slot = st.empty()
+    if report["summary"] is None:
+        # Fresh answer: show tokens as they arrive, then keep the text for history replay
+        with summary_slot:
+            report["summary"] = st.write_stream(
+                load_agent().stream_summary(report["query"], report["data"], report["kpis"])
+            )
+    summary_slot.markdown(f'<div class="report-section">{report["summary"]}</div>',
+                          unsafe_allow_html=True)
 
     # KPIs
     if report.get("kpis"):
@@ -127,29 +155,83 @@ def render_report(report: dict):
     # Chart
     if report.get("chart") is not None:
         st.markdown("### 📈 Visualization")
-        st.plotly_chart(report["chart"], use_container_width=True)
+        # Cached answers make identical charts — key them by message
+        st.plotly_chart(report["chart"], use_container_width=True, key=f"chart-{key}")
 
     # Data Table
     if report.get("data") is not None and not report["data"].empty:
         st.markdown("### 🗃️ Data")
-        with st.expander(f"View raw data ({report['row_count']} rows)", expanded=False):
-            st.dataframe(report["data"], use_container_width=True)
+        # A collapsed expander still ships its table to the browser on every rerun —
+        # behind a toggle the table is only serialized once the user asks for it
+        if st.toggle(f"View raw data ({report['row_count']} rows)", key=f"data-{key}"):
+            # Bound what st.dataframe serializes — KPIs already use every row
+            st.dataframe(report["data"].head(MAX_TABLE_ROWS), use_container_width=True)
+            if report["row_count"] > MAX_TABLE_ROWS:
+                st.caption(f"Showing the first {MAX_TABLE_ROWS:,} of {report['row_count']:,} rows.")
 
     # Metadata
     st.markdown("### ⚙️ Query Details")
-    meta_cols = st.columns(3)
-    with meta_cols[0]:
-        st.markdown(f"**Intent:** `{report.get('intent', 'N/A')}`")
-    with meta_cols[1]:
-        tables = ", ".join(report.get("tables_used", []))
-        st.markdown(f"**Tables:** `{tables}`")
-    with meta_cols[2]:
-        st.markdown(f"**Timestamp:** `{report.get('timestamp', 'N/A')[:19]}`")
+    tables = ", ".join(report.get("tables_used", []))
+    st.markdown(
+        f"**Intent:** `{report.get('intent', 'N/A')}` &nbsp;·&nbsp; "
+        f"**Tables:** `{tables}` &nbsp;·&nbsp; "
+        f"**Timestamp:** `{report.get('timestamp', 'N/A')[:19]}`"
+    )
 
     with st.expander("View generated SQL", expanded=False):
         st.code(report.get("sql_query", "N/A"), language="sql")
 
 
+@st.fragment
+def render_sidebar(agent: AnalyticsAgent):
+    """Sample questions + system info. A fragment, so it reruns without redrawing the chat."""
+    st.markdown("## 💡 Sample Questions")
+    for q in SAMPLE_QUESTIONS:
+        if st.button(q, use_container_width=True):
+            st.session_state["_pending_question"] = q
+            # Full-app rerun so main() picks up the pending question
+            st.rerun()
+
+    st.markdown("---")
+    st.markdown("## ℹ️ System Info")
+    st.markdown(f"**LLM:** {agent.llm.provider} / {agent.llm.model}")
+    st.markdown(f"**Database:** {agent.db_path}")
+    st.markdown(f"**Tables:** {len(agent.schema)}")
+    st.markdown(f"**LLM Available:** {'✅' if agent.llm.is_available() else '❌'}")
+
+
+def handle_question(agent: AnalyticsAgent, question: str):
+    """Show the question, run the agent, render the report and record both in chat history."""
+    st.session_state.messages.append({"role": "user", "content": question})
+    with st.chat_message("user"):
+        st.markdown(question)
+
+    with st.chat_message("assistant"):
+        with st.spinner("Analyzing..."):
+            start = time.perf_counter()
+            report = ask(agent, question)
+            report["elapsed_seconds"] = round(time.perf_counter() - start, 2)
+
+        msg_id = uuid4().hex
+        render_report(report, key=msg_id)
+        st.session_state.messages.append({"role": "assistant", "report": report, "id": msg_id})
+
+    # Trimmed after the answer so user/assistant pairs stay together
+    messages = st.session_state.messages
+    if len(messages) > MAX_HISTORY:
+        st.session_state.archived_messages.extend(messages[:-MAX_HISTORY])
+        del messages[:-MAX_HISTORY]
+
+
+def render_messages(messages: list):
+    for msg in messages:
+        with st.chat_message(msg["role"]):
+            if msg["role"] == "user":
+                st.markdown(msg["content"])
+            else:
+                render_report(msg["report"], key=msg["id"])
+
+
 # ---- Main App ----
 def main():
     # Header
@@ -163,70 +245,25 @@ def main():
     # Chat history
     if "messages" not in st.session_state:
         st.session_state.messages = []
+        st.session_state.archived_messages = []
 
-    # Display chat history
-    for msg in st.session_state.messages:
-        with st.chat_message(msg["role"]):
-            if msg["role"] == "user":
-                st.markdown(msg["content"])
-            else:
-                render_report(msg["report"])
-
-    # Chat input
-    if question := st.chat_input("Ask about your manufacturing data..."):
-        # Show user message
-        st.session_state.messages.append({"role": "user", "content": question})
-        with st.chat_message("user"):
-            st.markdown(question)
-
-        # Run agent
-        with st.chat_message("assistant"):
-            with st.spinner("Analyzing..."):
-                start = time.time()
-                report = agent.ask(question)
-                elapsed = time.time() - start
-                report["elapsed_seconds"] = round(elapsed, 2)
-
-            render_report(report)
-            st.session_state.messages.append({"role": "assistant", "report": report})
+    # Display chat history — archived messages only when asked for
+    archived = st.session_state.archived_messages
+    if archived and st.toggle(f"Load {len(archived)} earlier messages", key="show_archived"):
+        render_messages(archived)
+    render_messages(st.session_state.messages)
+
+    # One question per rerun: a typed question wins over a pending sidebar click,
+    # and the pending click is consumed either way so it can't fire twice
+    pending = st.session_state.pop("_pending_question", None)
+    question = st.chat_input("Ask about your manufacturing data...") or pending
+    if question:
+        handle_question(agent, question)
 
     # Sidebar
     with st.sidebar:
-        st.markdown("## 💡 Sample Questions")
-        sample_questions = [
-            "How many orders were completed?",
-            "What was the yield for LINE-3 this week?",
-            "Show me details for order PO-1042",
-            "Compare yield between day and night shift",
-            "Which supervisor had the best performance?",
-            "Plot yield trend for the last 10 days",
-            "What products did we make on 2026-02-14?",
-            "What's the average cycle time for ChemX-500?",
-        ]
-        for q in sample_questions:
-            if st.button(q, use_container_width=True):
-                st.session_state["_pending_question"] = q
-                st.rerun()
-
-        st.markdown("---")
-        st.markdown("## ℹ️ System Info")
-        st.markdown(f"**LLM:** {agent.llm.provider} / {agent.llm.model}")
-        st.markdown(f"**Database:** {agent.db_path}")
-        st.markdown(f"**Tables:** {len(agent.schema)}")
-        st.markdown(f"**LLM Available:** {'✅' if agent.llm.is_available() else '❌'}")
-
-    # Handle sidebar button clicks
-    if "_pending_question" in st.session_state:
-        q = st.session_state.pop("_pending_question")
-        st.session_state.messages.append({"role": "user", "content": q})
-        with st.chat_message("user"):
-            st.markdown(q)
-        with st.chat_message("assistant"):
-            with st.spinner("Analyzing..."):
-                report = agent.ask(q)
-            render_report(report)
-            st.session_state.messages.append({"role": "assistant", "report": report})
+        render_sidebar(agent)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()